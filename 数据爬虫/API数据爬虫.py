@@ -1,10 +1,11 @@
 import requests
 import json
-import csv
 import time
+from HTTP客户端 import get_session
+from 数据输出 import open_sink
 
 
-def api_crawler(api_url, params=None, headers=None, output_file='api_data.csv'):
+def api_crawler(api_url, params=None, headers=None, output_file='api_data.csv', flush_size=1000):
     """
     API数据爬虫示例 - 直接调用API接口获取数据
 
@@ -12,28 +13,23 @@ def api_crawler(api_url, params=None, headers=None, output_file='api_data.csv'):
         api_url: API接口URL
         params: 请求参数
         headers: 请求头
-        output_file: 输出文件名
+        output_file: 输出文件名（.csv / .jsonl / .parquet）
+        flush_size: 每攒够多少条记录写一次磁盘
     """
 
-    # 默认请求头
-    default_headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
-        'Accept': 'application/json'
-    }
-
-    # 合并请求头
+    # 通用请求头由共享会话提供，这里只补充Accept并合并调用方的请求头
+    request_headers = {'Accept': 'application/json'}
     if headers:
-        default_headers.update(headers)
+        request_headers.update(headers)
 
     try:
         print(f"正在调用API: {api_url}")
 
         # 发送API请求
-        response = requests.get(
+        response = get_session().get(
             api_url,
             params=params or {},
-            headers=default_headers,
-            timeout=10
+            headers=request_headers
         )
 
         # 检查请求状态
@@ -47,39 +43,29 @@ def api_crawler(api_url, params=None, headers=None, output_file='api_data.csv'):
         # 处理数据（根据实际API响应结构调整）
         if isinstance(data, list):
             # 如果响应是列表
-            processed_data = data
+            records = data
         elif isinstance(data, dict):
             # 如果响应是字典，提取其中的数据
             # 这里假设数据在'data'或'results'字段中，根据实际情况调整
-            processed_data = data.get('data', []) or data.get('results', [])
-            if not processed_data:
-                processed_data = [data]  # 如果没有找到数据字段，将整个响应作为一条记录
+            records = data.get('data', []) or data.get('results', [])
+            if not records:
+                records = [data]  # 如果没有找到数据字段，将整个响应作为一条记录
         else:
-            processed_data = [{'raw_data': str(data)}]
-
-        # 保存数据到CSV
-        if processed_data:
-            # 提取所有可能的字段名
-            fieldnames = set()
-            for item in processed_data:
-                if isinstance(item, dict):
-                    fieldnames.update(item.keys())
-
-            fieldnames = list(fieldnames)
-
-            with open(output_file, 'w', newline='', encoding='utf-8') as file:
-                writer = csv.DictWriter(file, fieldnames=fieldnames)
-                writer.writeheader()
-
-                for item in processed_data:
-                    if isinstance(item, dict):
-                        writer.writerow(item)
-                    else:
-                        # 如果数据不是字典，将其转换为字典
-                        writer.writerow({'value': item})
+            records = [{'raw_data': str(data)}]
+
+        # 逐条写入输出文件（非字典的数据会被包装成 {'value': item}）
+        if records:
+            sink_options = {'flush_size': flush_size, 'append': False}
+            if output_file.lower().endswith('.csv'):
+                # 记录已全部在内存中，表头取所有记录字段的并集（非字典数据写在 value 列）
+                sink_options['fieldnames'] = list(dict.fromkeys(
+                    key for item in records for key in (item if isinstance(item, dict) else ['value'])
+                ))
+            with open_sink(output_file, **sink_options) as sink:
+                sink.write_many(records)
 
             print(f"数据已保存到: {output_file}")
-            print(f"共保存 {len(processed_data)} 条记录，包含 {len(fieldnames)} 个字段")
+            print(f"共保存 {sink.count} 条记录")
         else:
             print("没有找到可保存的数据")
 
@@ -0,0 +1,292 @@
+"""
+B站视频下载 - BV号 -> 视频信息 -> DASH播放地址 -> 并行下载音视频轨 -> 边下载边合流
+
+    视频轨按Range分块并行下载，按顺序写入管道；音频轨同时下载写入另一条管道；
+    ffmpeg 从两条管道读取并流复制（-c copy）封装成MP4，最后一个字节到达后很快就能得到成品。
+    内存占用只与并发块数和块大小有关，与视频大小无关。
+    不支持向子进程传递管道的平台（Windows）先下载到临时文件再合流。
+"""
+import os
+import re
+import json
+import subprocess
+import itertools
+import threading
+import collections
+import concurrent.futures
+from HTTP客户端 import get_session
+from 分段下载器 import probe_range_support, ranged_download
+from 视频合流 import find_ffmpeg, mux_command, mux
+
+VIEW_API = 'https://api.bilibili.com/x/web-interface/view'
+PLAYURL_API = 'https://api.bilibili.com/x/player/playurl'
+BVID = re.compile(r'BV[0-9A-Za-z]{10}')
+
+# POSIX 平台可以把管道的文件描述符传给 ffmpeg（pass_fds）
+STREAMING_MUX = os.name == 'posix'
+
+
+def _headers(cookie=None):
+    """B站接口和视频CDN要求带Referer；登录Cookie（SESSDATA）可以获取更高清晰度"""
+    headers = {'Referer': 'https://www.bilibili.com/'}
+    if cookie:
+        headers['Cookie'] = cookie
+    return headers
+
+
+def _api_get(url, params, cookie=None):
+    response = get_session().get(url, params=params, headers=_headers(cookie))
+    response.raise_for_status()
+    data = response.json()
+    if data.get('code') != 0:
+        raise RuntimeError(f"B站接口返回错误: {data.get('code')} {data.get('message')}")
+    return data['data']
+
+
+def get_video_info(bvid, page=1, cookie=None):
+    """
+    获取视频标题和分P的cid
+
+    参数:
+        bvid: BV号（也可以是包含BV号的链接）
+        page: 第几P
+        cookie: 登录Cookie
+
+    返回:
+        (bvid, cid, 标题)
+    """
+    match = BVID.search(bvid)
+    if not match:
+        raise ValueError(f"无效的BV号: {bvid}")
+    bvid = match.group()
+
+    data = _api_get(VIEW_API, {'bvid': bvid}, cookie)
+    pages = data.get('pages') or [{'cid': data['cid']}]
+    if not 1 <= page <= len(pages):
+        raise ValueError(f"分P超出范围: {page}，视频共 {len(pages)} P")
+    cid = pages[page - 1]['cid']
+    title = data['title'] if len(pages) == 1 else f"{data['title']}_P{page}"
+    return bvid, cid, title
+
+
+def get_playurl(bvid, cid, quality=80, cookie=None):
+    """
+    获取DASH播放地址（fnval=16）
+
+    参数:
+        bvid: BV号
+        cid: 分P的cid
+        quality: 清晰度代码，80=1080P，64=720P，32=480P（高清晰度需要登录Cookie）
+        cookie: 登录Cookie
+
+    返回:
+        playurl接口返回的 data
+    """
+    params = {'bvid': bvid, 'cid': cid, 'qn': quality, 'fnval': 16, 'fourk': 1}
+    return _api_get(PLAYURL_API, params, cookie)
+
+
+def select_tracks(playurl, quality=80):
+    """
+    从playurl数据中选出视频轨和音频轨
+
+    参数:
+        playurl: playurl接口的 data（也兼容整个响应JSON）
+        quality: 最高清晰度代码
+
+    返回:
+        (视频轨URL, 音频轨URL)
+    """
+    if 'data' in playurl and 'dash' not in playurl:
+        playurl = playurl['data']
+    dash = playurl.get('dash')
+    if not dash:
+        raise ValueError("没有DASH数据（需要 fnval=16）")
+
+    def url_of(track):
+        return track.get('baseUrl') or track.get('base_url')
+
+    videos = [track for track in dash['video'] if track['id'] <= quality] or dash['video']
+    video = max(videos, key=lambda track: (track['id'], track.get('bandwidth', 0)))
+    audio = max(dash.get('audio') or [], key=lambda track: track.get('bandwidth', 0), default=None)
+    if audio is None:
+        raise ValueError("没有音频轨")
+    return url_of(video), url_of(audio)
+
+
+def _download_to(write, url, headers, connections=4, part_size=4 * 1024 * 1024, retries=3):
+    """
+    下载一条轨道，按顺序把数据交给 write
+
+    支持Range时分块并行下载：同时最多 connections*2 个块在途（已下载未写出的块也计算在内），
+    内存占用不超过 connections*2*part_size；不支持Range时单连接流式下载，
+    中途断开时重新请求，跳过已经写出的字节后继续。
+    """
+    session = get_session()
+    supports_range, size, _ = probe_range_support(url, headers)
+
+    if not supports_range or size <= part_size or connections <= 1:
+        written = 0
+        for attempt in range(retries):
+            try:
+                with session.get(url, headers=headers, stream=True, timeout=30) as response:
+                    response.raise_for_status()
+                    skip = written
+                    for chunk in response.iter_content(chunk_size=256 * 1024):
+                        if skip:
+                            # 已经写出的部分不能撤回，跳过重复的字节
+                            if len(chunk) <= skip:
+                                skip -= len(chunk)
+                                continue
+                            chunk, skip = chunk[skip:], 0
+                        write(chunk)
+                        written += len(chunk)
+                return
+            except BrokenPipeError:
+                raise
+            except Exception:
+                if attempt == retries - 1:
+                    raise
+
+    def fetch(start, end):
+        for attempt in range(retries):
+            try:
+                response = session.get(url, headers=dict(headers, Range=f'bytes={start}-{end}'), timeout=30)
+                response.raise_for_status()
+                if response.status_code != 206 or len(response.content) != end - start + 1:
+                    raise IOError(f"分块 {start}-{end} 大小不正确")
+                return response.content
+            except Exception:
+                if attempt == retries - 1:
+                    raise
+
+    ranges = iter([(start, min(start + part_size, size) - 1) for start in range(0, size, part_size)])
+    window = connections * 2
+    with concurrent.futures.ThreadPoolExecutor(max_workers=connections) as executor:
+        pending = collections.deque(executor.submit(fetch, *r) for r in itertools.islice(ranges, window))
+        try:
+            while pending:
+                write(pending.popleft().result())
+                for r in itertools.islice(ranges, 1):
+                    pending.append(executor.submit(fetch, *r))
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+def _stream_mux(video_url, audio_url, output_file, headers, connections):
+    """边下载边合流：两条轨道分别写入管道，ffmpeg 从 pipe:N 读取"""
+    ffmpeg = find_ffmpeg()
+    video_read, video_write = os.pipe()
+    audio_read, audio_write = os.pipe()
+
+    stem, ext = os.path.splitext(output_file)
+    tmp_file = f'{stem}.tmp{ext or ".mp4"}'
+    command = mux_command(f'pipe:{video_read}', f'pipe:{audio_read}', tmp_file, ffmpeg)
+    # 只把读端传给ffmpeg；写端不能被子进程继承，否则ffmpeg永远读不到文件结尾
+    process = subprocess.Popen(command, pass_fds=(video_read, audio_read),
+                               stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    os.close(video_read)
+    os.close(audio_read)
+
+    errors = []
+
+    def feed(fd, url, track_connections):
+        try:
+            with os.fdopen(fd, 'wb') as pipe:
+                _download_to(pipe.write, url, headers, track_connections)
+        except BrokenPipeError:
+            errors.append("ffmpeg提前退出")
+        except Exception as e:
+            errors.append(e)
+
+    threads = [
+        threading.Thread(target=feed, args=(video_write, video_url, connections), daemon=True),
+        threading.Thread(target=feed, args=(audio_write, audio_url, 1), daemon=True),
+    ]
+    for thread in threads:
+        thread.start()
+
+    stderr = process.communicate()[1].decode('utf-8', 'replace')
+    for thread in threads:
+        thread.join()
+
+    if errors or process.returncode != 0:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+        raise RuntimeError(f"下载或合流失败: {errors or stderr.strip()}")
+    os.replace(tmp_file, output_file)
+
+
+def _file_mux(video_url, audio_url, output_file, headers, connections):
+    """先把两条轨道并行下载到临时文件，再合流；合流结束（无论成功与否）后删除临时文件"""
+    stem = os.path.splitext(output_file)[0]
+    video_file, audio_file = f'{stem}.video.m4s', f'{stem}.audio.m4s'
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+        futures = [
+            executor.submit(ranged_download, video_url, video_file, headers, connections),
+            executor.submit(ranged_download, audio_url, audio_file, headers, 1),
+        ]
+        for future in futures:
+            future.result()
+
+    try:
+        mux(video_file, audio_file, output_file)
+    finally:
+        for path in (video_file, audio_file):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def download_bilibili(source, output_file=None, page=1, quality=80, connections=4, cookie=None, streaming=None):
+    """
+    下载B站视频（音视频合一的MP4）
+
+    参数:
+        source: BV号/视频链接，或playurl接口返回的JSON（dict或JSON文件路径）
+        output_file: 输出文件，默认用视频标题命名
+        page: 第几P（source为BV号时）
+        quality: 最高清晰度代码
+        connections: 视频轨的并行连接数
+        cookie: 登录Cookie
+        streaming: 是否边下载边合流，默认在支持的平台上开启
+
+    返回:
+        输出文件路径，失败时返回None
+    """
+    try:
+        if isinstance(source, dict):
+            playurl, title = source, 'bilibili'
+        elif source.endswith('.json') and os.path.exists(source):
+            with open(source, 'r', encoding='utf-8') as f:
+                playurl, title = json.load(f), os.path.splitext(os.path.basename(source))[0]
+        else:
+            bvid, cid, title = get_video_info(source, page, cookie)
+            playurl = get_playurl(bvid, cid, quality, cookie)
+
+        video_url, audio_url = select_tracks(playurl, quality)
+        output_file = output_file or re.sub(r'[\\/:*?"<>|]', '_', title) + '.mp4'
+        headers = _headers(cookie)
+
+        streaming = STREAMING_MUX if streaming is None else streaming
+        print(f"开始下载: {output_file}（{'边下载边合流' if streaming else '下载后合流'}）")
+        if streaming:
+            _stream_mux(video_url, audio_url, output_file, headers, connections)
+        else:
+            _file_mux(video_url, audio_url, output_file, headers, connections)
+
+        print(f"下载完成: {output_file}")
+        return output_file
+
+    except Exception as e:
+        print(f"B站视频下载失败: {e}")
+        return None
+
+
+# 使用示例
+if __name__ == "__main__":
+    download_bilibili('BV1GJ411x7h7', '新宝岛.mp4')
+
+    # 使用浏览器开发者工具中复制的playurl响应
+    # download_bilibili('playurl.json', 'B站视频.mp4')
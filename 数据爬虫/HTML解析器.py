@@ -0,0 +1,219 @@
+"""
+HTML解析后端 - 统一 BeautifulSoup / lxml 的解析和选择器接口
+
+可选后端（按速度从快到慢）:
+    'lxml'        lxml.html 解析 + 预编译的 CSS选择器/XPath（需要 lxml、cssselect）
+    'bs4-lxml'    BeautifulSoup + lxml 解析器
+    'html.parser' BeautifulSoup + Python内置解析器（最慢，但没有额外依赖）
+
+爬虫只通过 parse / select / select_one / text / attr 访问文档，因此可以按爬虫切换后端。
+选择器在第一次使用时编译并缓存，之后每个页面直接复用。
+"""
+import time
+import threading
+from bs4 import BeautifulSoup
+import soupsieve
+
+try:
+    import lxml.html
+    from lxml import etree
+    from lxml.cssselect import CSSSelector
+    HAS_LXML = True
+except ImportError:
+    HAS_LXML = False
+
+
+class Selector:
+    """
+    选择器 - CSS选择器，可附带一个等价的XPath
+
+    lxml后端优先使用XPath（可以表达CSS做不到的匹配，如不区分大小写的class包含），
+    BeautifulSoup后端使用CSS（由soupsieve执行）。
+    注意：XPath 以 "//" 开头时从文档根开始查找，在节点内查找时应使用 ".//"。
+    """
+
+    def __init__(self, css, xpath=None):
+        self.css = css
+        self.xpath = xpath
+
+    def __repr__(self):
+        return f'Selector({self.css!r})'
+
+
+class SoupBackend:
+    """BeautifulSoup后端"""
+
+    def __init__(self, features='html.parser'):
+        self.name = 'html.parser' if features == 'html.parser' else f'bs4-{features}'
+        self.features = features
+        self._compiled = {}
+
+    def parse(self, html):
+        """解析HTML文本，返回文档根节点"""
+        return BeautifulSoup(html, self.features)
+
+    def _compile(self, selector):
+        css = selector.css if isinstance(selector, Selector) else selector
+        compiled = self._compiled.get(css)
+        if compiled is None:
+            compiled = self._compiled[css] = soupsieve.compile(css)
+        return compiled
+
+    def select(self, node, selector):
+        """返回匹配选择器的所有节点"""
+        return self._compile(selector).select(node)
+
+    def select_one(self, node, selector):
+        """返回匹配选择器的第一个节点，没有时返回None"""
+        return self._compile(selector).select_one(node)
+
+    def text(self, node):
+        """节点的全部文本"""
+        return node.get_text() if node is not None else ''
+
+    def attr(self, node, name, default=None):
+        """节点的属性值"""
+        return node.get(name, default)
+
+
+class LxmlBackend:
+    """
+    lxml后端 - C实现的解析器，不构建BeautifulSoup对象树
+
+    编译好的XPath对象不能跨线程共享，因此每个线程各自缓存一份。
+    """
+
+    name = 'lxml'
+
+    def __init__(self):
+        if not HAS_LXML:
+            raise ImportError("lxml后端需要安装 lxml 和 cssselect: pip install lxml cssselect")
+        self._local = threading.local()
+
+    def parse(self, html):
+        """解析HTML文本，返回文档根节点"""
+        try:
+            return lxml.html.fromstring(html)
+        except ValueError:
+            # 带有编码声明的字符串不能直接解析，转为字节
+            return lxml.html.fromstring(html.encode('utf-8'))
+        except etree.ParserError:
+            # 空文档
+            return lxml.html.fromstring('<html></html>')
+
+    def _compile(self, selector):
+        if isinstance(selector, Selector):
+            key = (selector.css, selector.xpath)
+        else:
+            key = (selector, None)
+
+        cache = self._local.__dict__.setdefault('compiled', {})
+        compiled = cache.get(key)
+        if compiled is None:
+            css, xpath = key
+            compiled = cache[key] = etree.XPath(xpath) if xpath else CSSSelector(css)
+        return compiled
+
+    def select(self, node, selector):
+        """返回匹配选择器的所有节点"""
+        return self._compile(selector)(node)
+
+    def select_one(self, node, selector):
+        """返回匹配选择器的第一个节点，没有时返回None"""
+        result = self._compile(selector)(node)
+        return result[0] if result else None
+
+    def text(self, node):
+        """节点的全部文本"""
+        return node.text_content() if node is not None else ''
+
+    def attr(self, node, name, default=None):
+        """节点的属性值"""
+        return node.get(name, default)
+
+
+BACKENDS = {
+    'lxml': LxmlBackend,
+    'bs4-lxml': lambda: SoupBackend('lxml'),
+    'html.parser': lambda: SoupBackend('html.parser'),
+}
+
+_instances = {}
+
+
+def get_parser(name=None):
+    """
+    获取解析后端（同名后端共享一个实例，选择器编译缓存也随之共享）
+
+    参数:
+        name: 后端名称 'lxml' / 'bs4-lxml' / 'html.parser'，
+              为None时选择可用的最快后端；也可以直接传入后端实例
+    """
+    if name is not None and not isinstance(name, str):
+        return name
+    if name is None:
+        name = 'lxml' if HAS_LXML else 'html.parser'
+    if name not in BACKENDS:
+        raise ValueError(f"不支持的解析后端: {name}，可选: {', '.join(BACKENDS)}")
+
+    if name not in _instances:
+        _instances[name] = BACKENDS[name]()
+    return _instances[name]
+
+
+def available_backends():
+    """当前环境可用的后端名称"""
+    return [name for name in BACKENDS if name == 'html.parser' or HAS_LXML]
+
+
+def benchmark(html, extract, backends=None, repeat=50):
+    """
+    解析性能测试 - 统计每个后端每秒能处理多少个页面
+
+    参数:
+        html: 测试用的HTML文本
+        extract: 提取函数 extract(parser, root)，模拟爬虫的提取逻辑
+        backends: 要测试的后端名称列表，默认测试全部可用后端
+        repeat: 每个后端重复解析的次数
+
+    返回:
+        {后端名称: 每秒页面数}
+    """
+    results = {}
+    for name in backends or available_backends():
+        parser = get_parser(name)
+        extract(parser, parser.parse(html))  # 预热，编译选择器
+
+        start = time.perf_counter()
+        for _ in range(repeat):
+            extract(parser, parser.parse(html))
+        elapsed = time.perf_counter() - start
+
+        results[name] = repeat / elapsed
+        print(f"{name:<12} {results[name]:8.1f} 页/秒")
+    return results
+
+
+# 使用示例
+if __name__ == "__main__":
+    # 构造一个有500个商品卡片的列表页做性能测试
+    cards = ''.join(
+        f'<div class="Product-Card item"><a href="/product/{i}">商品{i}</a><p>描述{i}</p></div>'
+        for i in range(500)
+    )
+    sample_html = f'<html><head><title>商品列表</title></head><body>{cards}</body></html>'
+
+    product_card = Selector(
+        'div[class*="product" i]',
+        xpath="//div[contains(translate(@class, 'PRODUCT', 'product'), 'product')]"
+    )
+
+    def extract_links(parser, root):
+        links = []
+        for card in parser.select(root, product_card):
+            link = parser.select_one(card, 'a[href]')
+            if link is not None:
+                links.append(parser.attr(link, 'href'))
+        return links
+
+    benchmark(sample_html, extract_links)
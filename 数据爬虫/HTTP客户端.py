@@ -0,0 +1,105 @@
+import requests
+import threading
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# 所有爬虫共用的默认请求头（模拟浏览器访问），各模块只需补充Referer、Accept等差异部分
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/128.0.0.0 Safari/537.36',
+    'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
+}
+
+# 默认超时时间（秒），单个请求可以通过 timeout 参数覆盖
+DEFAULT_TIMEOUT = 10
+
+# 连接池参数：POOL_CONNECTIONS 是缓存的主机连接池个数，POOL_MAXSIZE 是每个主机保持的长连接数
+POOL_CONNECTIONS = 32
+POOL_MAXSIZE = 10
+# 共享会话被多个模块同时使用，连接池大一些
+SHARED_POOL_MAXSIZE = 16
+
+# 自动重试只针对建立连接失败（请求还没有发到服务器）；
+# 429/5xx 和读取超时交给调用方处理，调用方的重试会重新经过限速器，不会在同一层叠加重试
+MAX_RETRIES = 3
+RETRY_BACKOFF = 0.5
+
+
+class CrawlerSession(requests.Session):
+    """
+    爬虫会话 - 带连接池、默认请求头、默认超时和连接重试的 requests.Session
+
+    同一主机的请求复用长连接（keep-alive），省去每次请求的TCP和TLS握手。
+    连接池大小在创建时确定，之后不再修改（会话可能正被其他线程使用）；
+    并发数超过连接池大小时请求仍能完成，只是多出的连接用完即关闭，不再复用。
+    设置了 rate_limiter 时，每个请求（包括重定向后的请求）发出前按主机限速。
+    """
+
+    def __init__(self, headers=None, pool_maxsize=POOL_MAXSIZE, timeout=DEFAULT_TIMEOUT, rate_limiter=None):
+        """
+        初始化
+
+        参数:
+            headers: 在默认请求头基础上追加的请求头
+            pool_maxsize: 每个主机的连接池大小，应不小于该主机上的并发数
+            timeout: 默认超时时间（秒）
+            rate_limiter: HostRateLimiter按主机限速器，为None时不限速
+        """
+        super().__init__()
+        self.timeout = timeout
+        self.rate_limiter = rate_limiter
+        self.headers.update(DEFAULT_HEADERS)
+        if headers:
+            self.headers.update(headers)
+
+        retry = Retry(
+            total=MAX_RETRIES,
+            connect=MAX_RETRIES,
+            read=0,
+            status=0,
+            other=0,
+            backoff_factor=RETRY_BACKOFF,
+        )
+        adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=pool_maxsize, max_retries=retry)
+        self.mount('http://', adapter)
+        self.mount('https://', adapter)
+        self.pool_maxsize = pool_maxsize
+
+    def request(self, method, url, **kwargs):
+        # 未指定超时时使用默认超时，避免请求永远挂起
+        kwargs.setdefault('timeout', self.timeout)
+        return super().request(method, url, **kwargs)
+
+    def send(self, request, **kwargs):
+        # 在 send 中限速：重定向和认证重试（如 OAuth2Auth 的401重发）同样经过限速器
+        if self.rate_limiter:
+            self.rate_limiter.wait(request.url)
+        return super().send(request, **kwargs)
+
+
+_shared_session = None
+_shared_lock = threading.Lock()
+
+
+def get_session():
+    """
+    获取进程内共享的爬虫会话（所有模块共用同一组连接池，每个主机 SHARED_POOL_MAXSIZE 个长连接）
+    """
+    global _shared_session
+    with _shared_lock:
+        if _shared_session is None:
+            _shared_session = CrawlerSession(pool_maxsize=SHARED_POOL_MAXSIZE)
+        return _shared_session
+
+
+def create_session(headers=None, concurrency=None, timeout=DEFAULT_TIMEOUT, rate_limiter=None):
+    """
+    创建独立的爬虫会话（需要单独设置请求头、Cookie、认证信息或限速的爬虫使用）
+
+    参数:
+        headers: 在默认请求头基础上追加的请求头
+        concurrency: 并发数，用于确定每个主机的连接池大小
+        timeout: 默认超时时间（秒）
+        rate_limiter: HostRateLimiter按主机限速器
+    """
+    return CrawlerSession(headers=headers, pool_maxsize=max(concurrency or 0, POOL_MAXSIZE),
+                          timeout=timeout, rate_limiter=rate_limiter)
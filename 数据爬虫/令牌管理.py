@@ -0,0 +1,280 @@
+"""
+OAuth2令牌管理 - 多线程、多进程共享同一个访问令牌
+
+    令牌连同过期时间缓存在磁盘文件中，所有进程共用；
+    令牌快过期时由一个线程提前刷新，其他线程继续使用尚未过期的旧令牌，不会阻塞；
+    令牌已经过期时，同一时间只有一个线程（跨进程也只有一个）去请求新令牌，其余等待结果，
+    不会一窝蜂地请求认证服务器；
+    请求返回401时作废当前令牌，获取新令牌后自动重试一次；
+    令牌刚签发不久就返回401（多半是缺少权限，换令牌也没用）时不再刷新，直接把401返回给调用方。
+"""
+import os
+import json
+import time
+import hashlib
+import threading
+import contextlib
+from requests.auth import AuthBase
+from HTTP客户端 import get_session
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+def _user_cache_dir():
+    """当前用户的令牌缓存目录（只有当前用户可以访问）"""
+    if os.name == 'nt':
+        base = os.environ.get('LOCALAPPDATA') or os.path.expanduser('~')
+    else:
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+    path = os.path.join(base, 'oauth2_tokens')
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    return path
+
+
+@contextlib.contextmanager
+def _file_lock(path):
+    """跨进程文件锁（阻塞直到获得锁）"""
+    with open(path, 'a+b') as f:
+        if fcntl:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+        else:
+            while True:
+                try:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class OAuth2TokenManager:
+    """
+    OAuth2令牌管理器 - 支持 client_credentials 和 refresh_token 两种授权方式
+    """
+
+    def __init__(self, token_url, client_id, client_secret=None, refresh_token=None, scope=None,
+                 cache_path=None, refresh_margin=120, min_validity=10, min_token_age=60):
+        """
+        初始化
+
+        参数:
+            token_url: 令牌接口URL
+            client_id: 客户端ID
+            client_secret: 客户端密钥
+            refresh_token: 刷新令牌，提供时使用 refresh_token 授权，否则使用 client_credentials
+            scope: 权限范围
+            cache_path: 令牌缓存文件，默认放在当前用户的缓存目录中，按 token_url + client_id 命名，
+                        同一客户端的所有进程共用
+            refresh_margin: 距离过期多少秒时开始提前刷新
+            min_validity: 剩余有效期少于多少秒时视为已过期（必须等待刷新）
+            min_token_age: 令牌签发后多少秒内收到401不刷新（避免持续401的接口每个请求都请求认证服务器）
+        """
+        self.token_url = token_url
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.refresh_token = refresh_token
+        self.scope = scope
+        self.refresh_margin = refresh_margin
+        self.min_validity = min_validity
+        self.min_token_age = min_token_age
+
+        if cache_path is None:
+            digest = hashlib.sha1(f'{token_url}|{client_id}'.encode('utf-8')).hexdigest()[:12]
+            cache_path = os.path.join(_user_cache_dir(), f'oauth2_token_{digest}.json')
+        self.cache_path = cache_path
+        self.lock_path = cache_path + '.lock'
+
+        self._token = None  # {'access_token': ..., 'expires_at': ..., 'issued_at': ..., 'refresh_token': ...}
+        self._lock = threading.Lock()
+
+    def _remaining(self, token):
+        """令牌剩余有效秒数"""
+        if not token:
+            return -1
+        return token['expires_at'] - time.time()
+
+    def _read_cache(self):
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_cache(self, token):
+        # 先写临时文件再替换，其他进程不会读到写了一半的文件；
+        # 文件中是明文令牌，创建时就只允许当前用户读写
+        tmp_path = f'{self.cache_path}.{os.getpid()}.tmp'
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(token, f)
+        os.replace(tmp_path, self.cache_path)
+
+    def _request_token(self, refresh_token):
+        """向认证服务器请求新令牌"""
+        if refresh_token:
+            data = {'grant_type': 'refresh_token', 'refresh_token': refresh_token}
+        else:
+            data = {'grant_type': 'client_credentials'}
+        data['client_id'] = self.client_id
+        if self.client_secret:
+            data['client_secret'] = self.client_secret
+        if self.scope:
+            data['scope'] = self.scope
+
+        response = get_session().post(self.token_url, data=data, headers={'Accept': 'application/json'})
+        response.raise_for_status()
+        payload = response.json()
+
+        print("已获取新的OAuth2访问令牌")
+        now = time.time()
+        return {
+            'access_token': payload['access_token'],
+            'expires_at': now + int(payload.get('expires_in', 3600)),
+            'issued_at': now,
+            # 服务器可能轮换刷新令牌，没有返回时沿用旧的
+            'refresh_token': payload.get('refresh_token', refresh_token),
+        }
+
+    def _refresh(self, stale_token=None):
+        """
+        在跨进程锁内刷新令牌（调用方已持有线程锁）
+
+        拿到锁后先看缓存文件：如果其他进程已经刷新过，直接使用，不再请求。
+        """
+        with _file_lock(self.lock_path):
+            cached = self._read_cache()
+            if (cached and self._remaining(cached) > self.refresh_margin
+                    and (stale_token is None or cached['access_token'] != stale_token)):
+                self._token = cached
+                return cached
+
+            refresh_token = (cached or {}).get('refresh_token') or self.refresh_token
+            token = self._request_token(refresh_token)
+            self._write_cache(token)
+            self._token = token
+            return token
+
+    def get_token(self):
+        """
+        获取有效的访问令牌
+
+        令牌在提前刷新区间内时，只有一个线程去刷新，其余线程直接返回尚未过期的旧令牌。
+        """
+        token = self._token
+        remaining = self._remaining(token)
+        if remaining > self.refresh_margin:
+            return token['access_token']
+
+        if remaining > self.min_validity:
+            # 快过期但还能用：抢到锁的线程刷新，其余线程继续用旧令牌
+            if not self._lock.acquire(blocking=False):
+                return token['access_token']
+            try:
+                try:
+                    return self._refresh()['access_token']
+                except Exception as e:
+                    print(f"提前刷新令牌失败，继续使用旧令牌: {e}")
+                    return token['access_token']
+            finally:
+                self._lock.release()
+
+        # 已过期或还没有令牌：等待唯一的刷新者
+        with self._lock:
+            token = self._token
+            if self._remaining(token) > self.min_validity:
+                return token['access_token']
+
+            cached = self._read_cache()
+            if self._remaining(cached) > self.refresh_margin:
+                self._token = cached
+                return cached['access_token']
+
+            return self._refresh()['access_token']
+
+    def invalidate(self, access_token):
+        """
+        作废一个被服务器拒绝（401）的令牌
+
+        只有当前令牌仍是这个令牌时才会刷新；多个线程同时收到401时只刷新一次。
+        令牌签发不到 min_token_age 秒时不刷新：新令牌也被拒绝，说明问题不在令牌（如缺少权限）。
+
+        参数:
+            access_token: 被拒绝的令牌
+
+        返回:
+            已有（或已换成）新令牌时返回True，值得重试；令牌太新、不刷新时返回False
+        """
+        with self._lock:
+            token = self._token
+            if token and token['access_token'] != access_token:
+                return True
+            if token and time.time() - token.get('issued_at', 0) < self.min_token_age:
+                print("令牌刚签发不久仍被拒绝（可能缺少权限），不再刷新")
+                return False
+            self._token = None
+            self._refresh(stale_token=access_token)
+            return True
+
+
+class OAuth2Auth(AuthBase):
+    """
+    requests认证插件 - 为每个请求加上Bearer令牌，收到401时换新令牌重试一次
+
+    用法: session.auth = OAuth2Auth(token_manager, session)
+    """
+
+    def __init__(self, token_manager, session=None):
+        """
+        初始化
+
+        参数:
+            token_manager: OAuth2TokenManager
+            session: 发送请求的会话，401后的重试通过它发出（经过会话的限速器）；
+                     为None时直接用原连接重发
+        """
+        self.token_manager = token_manager
+        self.session = session
+
+    def __call__(self, request):
+        token = self.token_manager.get_token()
+        request.headers['Authorization'] = f'Bearer {token}'
+        request.register_hook('response', self._handle_401)
+        return request
+
+    def _handle_401(self, response, **kwargs):
+        request = response.request
+        if response.status_code != 401 or getattr(request, '_oauth2_retried', False):
+            return response
+
+        old_token = request.headers.get('Authorization', '')[len('Bearer '):]
+        if not self.token_manager.invalidate(old_token):
+            return response
+
+        # 读完并释放原响应的连接，再用新令牌重发同一个请求
+        response.content
+        response.close()
+
+        retry = request.copy()
+        retry.headers['Authorization'] = f'Bearer {self.token_manager.get_token()}'
+        retry._oauth2_retried = True
+
+        if self.session is not None:
+            new_response = self.session.send(retry, **kwargs)
+        else:
+            new_response = response.connection.send(retry, **kwargs)
+        new_response.history.append(response)
+        new_response.request = retry
+        return new_response
@@ -0,0 +1,208 @@
+import os
+import json
+import threading
+import concurrent.futures
+from HTTP客户端 import get_session, DEFAULT_TIMEOUT
+
+
+def _state_path(output_file):
+    """断点续传状态文件路径"""
+    return output_file + '.download.json'
+
+
+def _load_state(output_file):
+    """读取断点续传状态，不存在或已损坏时返回None"""
+    try:
+        with open(_state_path(output_file), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _save_state(output_file, state):
+    """原子地保存断点续传状态（先写临时文件再替换）"""
+    path = _state_path(output_file)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+
+def probe_range_support(url, headers=None, timeout=DEFAULT_TIMEOUT):
+    """
+    探测服务器是否支持Range请求
+
+    参数:
+        url: 文件URL
+        headers: 额外的请求头（如Referer）
+        timeout: 超时时间（秒）
+
+    返回:
+        (是否支持Range, 文件总大小, 校验值)；校验值是ETag，服务器没有返回ETag时是Last-Modified，都没有时为空
+    """
+    probe_headers = dict(headers or {})
+    probe_headers['Range'] = 'bytes=0-0'
+
+    response = get_session().get(url, headers=probe_headers, stream=True, timeout=timeout)
+    try:
+        response.raise_for_status()
+        etag = response.headers.get('ETag') or response.headers.get('Last-Modified', '')
+
+        # 206 + Content-Range: bytes 0-0/12345 说明支持分段下载
+        content_range = response.headers.get('Content-Range', '')
+        if response.status_code == 206 and '/' in content_range:
+            total = content_range.rsplit('/', 1)[1]
+            if total.isdigit():
+                return True, int(total), etag
+
+        return False, int(response.headers.get('content-length', 0)), etag
+    finally:
+        response.close()
+
+
+def _stream_download(url, output_file, headers=None, chunk_size=64 * 1024):
+    """
+    单连接流式下载（服务器不支持Range时使用）
+
+    参数:
+        url: 文件URL
+        output_file: 输出文件名
+        headers: 额外的请求头（如Referer）
+        chunk_size: 每次读取的块大小
+    """
+    with get_session().get(url, headers=headers, stream=True, timeout=30) as response:
+        response.raise_for_status()
+
+        total_size = int(response.headers.get('content-length', 0))
+        downloaded_size = 0
+
+        with open(output_file, 'wb') as f:
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                if chunk:
+                    f.write(chunk)
+                    downloaded_size += len(chunk)
+
+                    # 显示下载进度
+                    if total_size > 0:
+                        progress = (downloaded_size / total_size) * 100
+                        print(f"\r下载进度: {progress:.1f}%", end='', flush=True)
+
+    print()
+    return output_file
+
+
+def ranged_download(url, output_file, headers=None, connections=4, part_size=4 * 1024 * 1024,
+                    chunk_size=256 * 1024, retries=3):
+    """
+    多连接分段下载器 - 按字节范围并行下载大文件，支持断点续传
+
+    文件被切分成若干个 part_size 大小的字节范围，由 connections 个连接并行下载，
+    每个范围直接写入预分配文件的对应偏移处。已完成的范围记录在
+    "<output_file>.download.json" 状态文件中，中断后重新运行只会下载缺失的范围。
+    服务器不支持Range请求时自动退回单连接流式下载。
+
+    参数:
+        url: 文件URL
+        output_file: 输出文件名
+        headers: 额外的请求头（如Referer）
+        connections: 并行连接数
+        part_size: 每个字节范围的大小
+        chunk_size: 每次读取的块大小
+        retries: 每个字节范围的失败重试次数
+
+    返回:
+        输出文件名；有范围下载失败时抛出异常（状态文件会保留，重新运行即可续传）
+    """
+    supports_range, total_size, etag = probe_range_support(url, headers)
+
+    if not supports_range or total_size <= 0:
+        print("服务器不支持分段下载，使用单连接下载")
+        return _stream_download(url, output_file, headers)
+
+    # 状态文件与当前文件一致时续传，否则重新开始
+    state = _load_state(output_file)
+    if (not state or state.get('url') != url or state.get('size') != total_size
+            or state.get('etag') != etag or not os.path.exists(output_file)):
+        ranges = [[start, min(start + part_size, total_size) - 1]
+                  for start in range(0, total_size, part_size)]
+        state = {'url': url, 'size': total_size, 'etag': etag, 'ranges': ranges, 'done': []}
+
+        # 预分配输出文件
+        with open(output_file, 'wb') as f:
+            f.truncate(total_size)
+        _save_state(output_file, state)
+    else:
+        print(f"发现未完成的下载，已完成 {len(state['done'])}/{len(state['ranges'])} 个分段，继续下载")
+
+    done = set(state['done'])
+    pending = [i for i in range(len(state['ranges'])) if i not in done]
+
+    session = get_session()
+    lock = threading.Lock()
+    progress = {'downloaded': sum(state['ranges'][i][1] - state['ranges'][i][0] + 1 for i in done)}
+
+    def download_range(index):
+        start, end = state['ranges'][index]
+        range_headers = dict(headers or {})
+        range_headers['Range'] = f'bytes={start}-{end}'
+
+        for attempt in range(retries):
+            received = 0
+            try:
+                # with 保证出错时关闭响应，连接回到连接池，重试不会泄漏连接
+                with session.get(url, headers=range_headers, stream=True, timeout=30) as response:
+                    response.raise_for_status()
+                    if response.status_code != 206:
+                        raise IOError(f"服务器未返回分段内容，状态码: {response.status_code}")
+
+                    with open(output_file, 'r+b') as f:
+                        f.seek(start)
+                        for chunk in response.iter_content(chunk_size=chunk_size):
+                            if chunk:
+                                f.write(chunk)
+                                received += len(chunk)
+                                with lock:
+                                    progress['downloaded'] += len(chunk)
+
+                if received != end - start + 1:
+                    raise IOError(f"分段 {index} 数据不完整: {received}/{end - start + 1}")
+
+                # 记录已完成的分段
+                with lock:
+                    state['done'].append(index)
+                    _save_state(output_file, state)
+                    percent = progress['downloaded'] / total_size * 100
+                    print(f"\r下载进度: {percent:.1f}%", end='', flush=True)
+                return
+
+            except Exception as e:
+                with lock:
+                    progress['downloaded'] -= received
+                if attempt == retries - 1:
+                    raise
+                print(f"\n分段 {index} 下载失败，正在重试({attempt + 1}/{retries}): {e}")
+
+    failed = 0
+    with concurrent.futures.ThreadPoolExecutor(max_workers=connections) as executor:
+        futures = [executor.submit(download_range, index) for index in pending]
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                failed += 1
+                print(f"\n分段下载失败: {e}")
+
+    print()
+    if failed:
+        raise IOError(f"{failed} 个分段下载失败，重新运行可继续下载")
+
+    # 全部完成，删除状态文件
+    os.remove(_state_path(output_file))
+    return output_file
+
+
+# 使用示例
+if __name__ == "__main__":
+    # 示例：8个连接并行下载大文件
+    # ranged_download('https://example.com/big_video.mp4', 'big_video.mp4', connections=8)
+    pass
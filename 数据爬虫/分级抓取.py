@@ -0,0 +1,273 @@
+"""
+分级抓取 - 先用普通HTTP请求提取页面内嵌的JSON数据，拿不到需要的字段时才启动浏览器
+
+很多"动态"页面把数据直接写在HTML里:
+    <script id="__NEXT_DATA__" type="application/json">{...}</script>      Next.js
+    window.__INITIAL_STATE__ = {...};                                     Vue/React服务端渲染
+    <script type="application/ld+json">{...}</script>                     结构化数据
+这类页面一次HTTP请求就能拿到全部数据，不需要浏览器。
+
+每个域名使用的方式会被记住（可以保存到 StateStore），同一域名后面的URL直接使用该方式：
+    只有HTTP请求成功、但页面内嵌数据不完整时，域名才改用浏览器，不再重复尝试注定失败的HTTP请求；
+    超时、5xx等传输错误只让这一个URL改用浏览器，不会改变域名的抓取方式；
+    改用浏览器的记录在 browser_ttl 秒后过期，过期后重新试探HTTP请求。
+"""
+import re
+import json
+import time
+import threading
+from urllib.parse import urlparse
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from HTTP客户端 import create_session
+from 限速器 import HostRateLimiter
+from 浏览器池 import BrowserPool
+from 动态内容爬虫 import scroll_until_idle, extract_page_data
+
+# <script> 标签中的JSON
+SCRIPT_JSON = {
+    'next_data': re.compile(r'<script[^>]*\bid=["\']__NEXT_DATA__["\'][^>]*>(.*?)</script>', re.S | re.I),
+    'ld_json': re.compile(r'<script[^>]*\btype=["\']application/ld\+json["\'][^>]*>(.*?)</script>', re.S | re.I),
+}
+
+# 赋值给 window 全局变量的JSON，值从等号后开始解析
+WINDOW_STATE = {
+    'initial_state': re.compile(r'window\.__INITIAL_STATE__\s*=\s*'),
+    'preloaded_state': re.compile(r'window\.__PRELOADED_STATE__\s*=\s*'),
+    'apollo_state': re.compile(r'window\.__APOLLO_STATE__\s*=\s*'),
+}
+
+UNDEFINED = re.compile(r'(?<=[:\[,])\s*undefined\b')
+
+_decoder = json.JSONDecoder()
+
+
+def _parse_js_value(text, start):
+    """从 start 位置解析一个JSON值，忽略后面的分号等内容；兼容JS中的 undefined"""
+    try:
+        return _decoder.raw_decode(text, start)[0]
+    except ValueError:
+        pass
+    # 只处理到 </script> 为止，避免替换整个页面
+    end = text.find('</script>', start)
+    fragment = UNDEFINED.sub('null', text[start:end if end != -1 else len(text)])
+    try:
+        return _decoder.raw_decode(fragment)[0]
+    except ValueError:
+        return None
+
+
+def extract_embedded_json(html):
+    """
+    提取页面内嵌的JSON数据
+
+    参数:
+        html: 页面HTML
+
+    返回:
+        {'next_data': ..., 'initial_state': ..., 'ld_json': [...], ...}，只包含找到的部分
+    """
+    data = {}
+
+    match = SCRIPT_JSON['next_data'].search(html)
+    if match:
+        try:
+            data['next_data'] = json.loads(match.group(1))
+        except ValueError:
+            pass
+
+    ld_json = []
+    for match in SCRIPT_JSON['ld_json'].finditer(html):
+        try:
+            ld_json.append(json.loads(match.group(1)))
+        except ValueError:
+            continue
+    if ld_json:
+        data['ld_json'] = ld_json
+
+    for name, pattern in WINDOW_STATE.items():
+        match = pattern.search(html)
+        if match:
+            value = _parse_js_value(html, match.end())
+            if value is not None:
+                data[name] = value
+
+    return data
+
+
+def lookup(data, path):
+    """
+    按点号分隔的路径取值，列表可以用数字下标，如 'next_data.props.pageProps.items' 或 'ld_json.0.name'
+
+    返回:
+        找到的值，路径不存在时返回None
+    """
+    for key in path.split('.'):
+        if isinstance(data, dict):
+            data = data.get(key)
+        elif isinstance(data, list) and key.isdigit() and int(key) < len(data):
+            data = data[int(key)]
+        else:
+            return None
+        if data is None:
+            return None
+    return data
+
+
+class TieredFetcher:
+    """
+    分级抓取器 - HTTP + 内嵌JSON优先，必要时使用浏览器
+    """
+
+    NAMESPACE = 'fetch_tier'
+
+    def __init__(self, required=None, state_store=None, pool=None, requests_per_second=1.0, max_scrolls=0,
+                 browser_ttl=24 * 3600):
+        """
+        初始化
+
+        参数:
+            required: 判断数据是否完整：字段路径列表（见 lookup，全部存在才算完整）
+                      或函数 required(data) -> bool；为None时找到任意内嵌JSON即可
+            state_store: 状态存储（StateStore），保存每个域名使用的抓取方式；为None时只在内存中记录
+            pool: 浏览器池，为None时第一次需要浏览器时创建一个单浏览器的池
+            requests_per_second: HTTP请求每个主机每秒允许的请求数
+            max_scrolls: 使用浏览器时的滚动次数
+            browser_ttl: 域名改用浏览器多少秒后重新试探HTTP请求
+        """
+        self.required = required
+        self.state_store = state_store
+        self.pool = pool
+        self._own_pool = False
+        self.max_scrolls = max_scrolls
+        self.browser_ttl = browser_ttl
+        self.session = create_session(rate_limiter=HostRateLimiter(rate=requests_per_second))
+        self._tiers = {}
+        self._lock = threading.Lock()
+
+    def _complete(self, data):
+        if not data:
+            return False
+        if self.required is None:
+            return True
+        if callable(self.required):
+            return bool(self.required(data))
+        return all(lookup(data, path) is not None for path in self.required)
+
+    def get_tier(self, domain):
+        """
+        域名使用的抓取方式：'http'、'browser' 或 None（还没抓取过，或改用浏览器的记录已过期）
+        """
+        if domain not in self._tiers and self.state_store is not None:
+            record = self.state_store.get(self.NAMESPACE, domain)
+            if isinstance(record, str):  # 旧格式只保存了方式，没有时间，视为已过期
+                record = {'tier': record, 'at': 0}
+            self._tiers[domain] = record
+        record = self._tiers.get(domain)
+        if not record:
+            return None
+        if record['tier'] == 'browser' and time.time() - record['at'] > self.browser_ttl:
+            return None
+        return record['tier']
+
+    def set_tier(self, domain, tier):
+        """记录域名使用的抓取方式（同时记录时间，改用浏览器的记录按 browser_ttl 过期）"""
+        record = self._tiers.get(domain)
+        if tier == 'http' and record and record['tier'] == 'http':
+            return
+        record = {'tier': tier, 'at': time.time()}
+        self._tiers[domain] = record
+        if self.state_store is not None:
+            self.state_store.set(self.NAMESPACE, domain, record)
+        print(f"{domain} 使用 {tier} 方式抓取")
+
+    def fetch_http(self, url):
+        """普通HTTP请求 + 提取内嵌JSON"""
+        response = self.session.get(url)
+        response.raise_for_status()
+        return extract_embedded_json(response.text)
+
+    def _get_pool(self):
+        with self._lock:
+            if self.pool is None:
+                self.pool = BrowserPool(size=1, tabs=1, block_types=('image', 'font', 'media'))
+                self._own_pool = True
+            return self.pool
+
+    def fetch_browser(self, url):
+        """用浏览器渲染页面，提取内嵌JSON和页面内容"""
+        with self._get_pool().lease() as driver:
+            driver.get(url)
+            WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.TAG_NAME, "body")))
+            if self.max_scrolls:
+                scroll_until_idle(driver, self.max_scrolls)
+            data = extract_embedded_json(driver.page_source)
+            data['dom'] = extract_page_data(driver)
+            return data
+
+    def fetch(self, url):
+        """
+        抓取一个页面
+
+        参数:
+            url: 页面URL
+
+        返回:
+            {'url': URL, 'tier': 'http' 或 'browser', 'data': 提取到的数据}；
+            两种方式都失败或浏览器拿到的数据也不完整时 data 为None
+        """
+        domain = urlparse(url).netloc
+
+        incomplete = False
+        if self.get_tier(domain) != 'browser':
+            try:
+                data = self.fetch_http(url)
+                if self._complete(data):
+                    self.set_tier(domain, 'http')
+                    return {'url': url, 'tier': 'http', 'data': data}
+                print(f"页面内嵌数据不完整，改用浏览器: {url}")
+                incomplete = True
+            except Exception as e:
+                # 传输错误可能只是偶发的超时或5xx，只有这个URL改用浏览器
+                print(f"HTTP抓取失败，本次改用浏览器: {url}: {e}")
+
+        try:
+            data = self.fetch_browser(url)
+        except Exception as e:
+            print(f"浏览器抓取失败: {url}: {e}")
+            return {'url': url, 'tier': 'browser', 'data': None}
+
+        if not self._complete(data):
+            print(f"浏览器抓取的数据也不完整: {url}")
+            return {'url': url, 'tier': 'browser', 'data': None}
+        if incomplete:
+            # HTTP页面正常但缺少数据，浏览器能拿到：这个域名以后直接使用浏览器
+            self.set_tier(domain, 'browser')
+        return {'url': url, 'tier': 'browser', 'data': data}
+
+    def close(self):
+        """关闭自己创建的浏览器池"""
+        if self._own_pool and self.pool is not None:
+            self.pool.close()
+            self.pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+# 使用示例
+if __name__ == "__main__":
+    # Next.js页面：商品列表在 __NEXT_DATA__ 中，一次HTTP请求就能拿到
+    with TieredFetcher(required=['next_data.props.pageProps']) as fetcher:
+        result = fetcher.fetch('https://nextjs.org/')
+        print(result['tier'], list(result['data'] or {}))
+
+    # 记住每个域名的抓取方式，下次运行直接使用
+    # from 状态存储 import StateStore
+    # with StateStore('crawl_state.db') as store, TieredFetcher(state_store=store) as fetcher:
+    #     for url in urls:
+    #         print(fetcher.fetch(url)['tier'])
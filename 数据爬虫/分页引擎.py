@@ -0,0 +1,266 @@
+"""
+分页引擎 - 按分页方式并发/预取API分页数据，并按页码顺序产出
+
+分页方式（策略）:
+    PagePagination        ?page=1&limit=100
+    OffsetPagination      ?offset=0&limit=100
+    CursorPagination      响应体中给出下一页的游标或下一页URL
+    LinkHeaderPagination  响应头 Link: <...>; rel="next"
+
+页码/偏移量分页可以直接算出任意一页的请求参数：
+    已知总数时，剩余页面在并发窗口内同时请求；
+    不知道总数时，预取后面几页，遇到不满一页的结果即停止。
+游标/Link分页的下一页依赖上一页的响应，只能顺序请求，
+但会在调用方处理当前页数据的同时预先请求下一页。
+请求速度由 fetch 使用的会话（限速器）控制。
+"""
+import math
+import itertools
+import collections
+import concurrent.futures
+
+# 一页的解析结果：本页数据、下一页请求 (url, params)、数据总数
+Page = collections.namedtuple('Page', ['items', 'next_request', 'total'])
+
+
+def _get_path(data, path):
+    """按点号分隔的路径取值，如 'meta.total'"""
+    if not path:
+        return data
+    for key in path.split('.'):
+        if not isinstance(data, dict):
+            return None
+        data = data.get(key)
+    return data
+
+
+def _extract_items(data, items_key):
+    """从响应JSON中取出本页数据列表"""
+    if isinstance(data, list):
+        return data
+    items = _get_path(data, items_key) if items_key else None
+    if items is None and isinstance(data, dict):
+        # 没有指定字段时，依次尝试常见字段名
+        for key in ('data', 'results', 'items', 'list'):
+            if isinstance(data.get(key), list):
+                return data[key]
+    return items if isinstance(items, list) else []
+
+
+class PagePagination:
+    """页码分页 - ?page=N&limit=M"""
+
+    indexed = True
+
+    def __init__(self, page_size=100, page_param='page', size_param='limit', start=1,
+                 items_key=None, total_key=None):
+        """
+        初始化
+
+        参数:
+            page_size: 每页大小
+            page_param: 页码参数名
+            size_param: 每页大小参数名
+            start: 第一页的页码
+            items_key: 响应中数据列表的字段路径，如 'data.list'，响应本身是列表时不用设置
+            total_key: 响应中数据总数的字段路径，如 'meta.total'，设置后可并发请求所有页
+        """
+        self.page_size = page_size
+        self.page_param = page_param
+        self.size_param = size_param
+        self.start = start
+        self.items_key = items_key
+        self.total_key = total_key
+
+    def request_for(self, index):
+        """第 index 页（从0开始）的请求"""
+        return None, {self.page_param: self.start + index, self.size_param: self.page_size}
+
+    def first_request(self):
+        return self.request_for(0)
+
+    def parse(self, response, index):
+        data = response.json()
+        total = _get_path(data, self.total_key) if self.total_key else None
+        return Page(_extract_items(data, self.items_key), self.request_for(index + 1), total)
+
+
+class OffsetPagination(PagePagination):
+    """偏移量分页 - ?offset=N&limit=M"""
+
+    def __init__(self, page_size=100, offset_param='offset', size_param='limit',
+                 items_key=None, total_key=None):
+        super().__init__(page_size, offset_param, size_param, 0, items_key, total_key)
+
+    def request_for(self, index):
+        return None, {self.page_param: index * self.page_size, self.size_param: self.page_size}
+
+
+class CursorPagination:
+    """
+    游标分页 - 响应体中给出下一页的游标（或下一页的完整URL）
+    """
+
+    indexed = False
+
+    def __init__(self, cursor_param='cursor', next_key='next_cursor', items_key=None,
+                 page_size=None, size_param='limit', next_is_url=False):
+        """
+        初始化
+
+        参数:
+            cursor_param: 游标参数名
+            next_key: 响应中下一页游标的字段路径，如 'paging.next'
+            items_key: 响应中数据列表的字段路径
+            page_size: 每页大小，为None时不传
+            size_param: 每页大小参数名
+            next_is_url: next_key 给出的是下一页的完整URL而不是游标
+        """
+        self.cursor_param = cursor_param
+        self.next_key = next_key
+        self.items_key = items_key
+        self.page_size = page_size
+        self.size_param = size_param
+        self.next_is_url = next_is_url
+
+    def _base_params(self):
+        return {self.size_param: self.page_size} if self.page_size else {}
+
+    def first_request(self):
+        return None, self._base_params()
+
+    def parse(self, response, index):
+        data = response.json()
+        items = _extract_items(data, self.items_key)
+        cursor = _get_path(data, self.next_key)
+
+        next_request = None
+        if cursor and items:
+            if self.next_is_url:
+                next_request = (cursor, None)
+            else:
+                params = self._base_params()
+                params[self.cursor_param] = cursor
+                next_request = (None, params)
+        return Page(items, next_request, None)
+
+
+class LinkHeaderPagination:
+    """Link响应头分页 - Link: <https://api.example.com/items?page=2>; rel="next" """
+
+    indexed = False
+
+    def __init__(self, items_key=None, page_size=None, size_param='per_page'):
+        """
+        初始化
+
+        参数:
+            items_key: 响应中数据列表的字段路径
+            page_size: 每页大小，为None时不传
+            size_param: 每页大小参数名
+        """
+        self.items_key = items_key
+        self.page_size = page_size
+        self.size_param = size_param
+
+    def first_request(self):
+        return None, ({self.size_param: self.page_size} if self.page_size else {})
+
+    def parse(self, response, index):
+        items = _extract_items(response.json(), self.items_key)
+        next_link = response.links.get('next', {}).get('url')
+        # 下一页URL中已经带有全部参数
+        return Page(items, (next_link, None) if next_link and items else None, None)
+
+
+def ordered_window(executor, fetch_page, indexes, window):
+    """
+    在并发窗口内请求多个页面，按页码顺序产出结果
+
+    同时在途的请求不超过 window 个，结果也最多缓存 window 个：前面的页面没有完成时不会继续提交，
+    不会一次性为所有页面创建任务，也不会因为一个慢页面而无限堆积后面的结果。
+
+    参数:
+        executor: 线程池
+        fetch_page: 请求单页的函数 fetch_page(index) -> Page
+        indexes: 页码的可迭代对象（可以是无限的）
+        window: 同时在途的最大请求数
+    """
+    pending = collections.deque()
+    try:
+        for index in indexes:
+            pending.append((index, executor.submit(fetch_page, index)))
+            if len(pending) >= window:
+                first_index, future = pending.popleft()
+                yield first_index, future.result()
+        while pending:
+            first_index, future = pending.popleft()
+            yield first_index, future.result()
+    finally:
+        # 提前结束时取消还没开始的请求
+        for _, future in pending:
+            future.cancel()
+
+
+def paginate(fetch, strategy, max_pages=None, concurrency=4, prefetch=1):
+    """
+    分页抓取，按页码顺序产出 (页序号, 本页数据)（生成器）
+
+    参数:
+        fetch: 发送请求的函数 fetch(url, params) -> requests.Response，url为None表示使用默认端点
+        strategy: 分页策略（PagePagination / OffsetPagination / CursorPagination / LinkHeaderPagination）
+        max_pages: 最大页数
+        concurrency: 已知总数时同时请求的页数
+        prefetch: 不知道总数时预先请求的页数
+    """
+    if strategy.indexed:
+        yield from _paginate_indexed(fetch, strategy, max_pages, concurrency, prefetch)
+    else:
+        yield from _paginate_linked(fetch, strategy, max_pages)
+
+
+def _paginate_indexed(fetch, strategy, max_pages, concurrency, prefetch):
+    """页码/偏移量分页"""
+    page_size = strategy.page_size
+
+    def fetch_page(index):
+        return strategy.parse(fetch(*strategy.request_for(index)), index)
+
+    first = fetch_page(0)
+    yield 0, first.items
+
+    if max_pages == 1 or (first.total is None and len(first.items) < page_size):
+        return
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(concurrency, prefetch + 1)) as executor:
+        if first.total is not None:
+            # 已知总数：剩余页面在并发窗口内同时请求
+            pages = math.ceil(first.total / page_size)
+            if max_pages:
+                pages = min(pages, max_pages)
+            for index, page in ordered_window(executor, fetch_page, range(1, pages), concurrency):
+                yield index, page.items
+            return
+
+        # 不知道总数：预取后面几页，遇到不满一页的结果即停止
+        indexes = range(1, max_pages) if max_pages else itertools.count(1)
+        for index, page in ordered_window(executor, fetch_page, indexes, prefetch + 1):
+            yield index, page.items
+            if len(page.items) < page_size:
+                return
+
+
+def _paginate_linked(fetch, strategy, max_pages):
+    """游标/Link分页：下一页依赖上一页的响应，在调用方处理当前页的同时请求下一页"""
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+        request, index = strategy.first_request(), 0
+        future = executor.submit(fetch, *request)
+        while future is not None:
+            page = strategy.parse(future.result(), index)
+
+            future = None
+            if page.next_request and page.items and (not max_pages or index + 1 < max_pages):
+                future = executor.submit(fetch, *page.next_request)
+
+            yield index, page.items
+            index += 1
@@ -1,21 +1,17 @@
 #剪辑B站视频代码
-#第三方模块专门做视频剪辑  moviepy
+#合并音视频用ffmpeg流复制（不重新编码）；第三方模块 moviepy 只用于真正的剪辑
 
-import moviepy
+from 视频合流 import mux
 """
 步骤：
-1、先加载素材文件，加载视频素材文件，VideoFileClip()
-2、加载音频素材文件，AudioFileClip()
-3、将音频素材合并到视频素材里面去
-4、最终将素材视频导出
+1、B站的视频和音频是分开的两个文件，都已经编码好了
+2、用ffmpeg把两条轨道直接封装进同一个MP4（-c copy），不解码、不重新编码，画质无损
+3、需要裁剪、拼接等真正的剪辑时，再用moviepy处理
 """
 
-vedio = moviepy.VideoFileClip('B站视频.mp4')
-audio = moviepy.AudioFileClip('B站音频.mp3')
+mux('B站视频.mp4', 'B站音频.mp3', '新宝岛.mp4')
 
-#with_audio
-#形成新的素材文件
-file = vedio.with_audio(audio)
-
-#write_videofile 导出最终素材
-file.write_videofile('新宝岛.mp4')
\ No newline at end of file
+#需要剪辑时（会重新编码）：例如截取前30秒
+#import moviepy
+#clip = moviepy.VideoFileClip('新宝岛.mp4').subclipped(0, 30)
+#clip.write_videofile('新宝岛_片段.mp4')
@@ -2,29 +2,127 @@ from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.chrome.options import Options
-import time
+from 浏览器池 import default_chrome_options
+from 网络捕获 import DEFAULT_BLOCKED_TYPES, block_resources, capture_json
+from 数据输出 import open_sink
 import csv
 
 
-def dynamic_content_crawler(url, output_file='dynamic_data.csv'):
+# 滚动到底部后用MutationObserver监听DOM变化：新内容插入后安静 quietMs 毫秒即返回，
+# 最多等待 timeoutMs 毫秒；返回页面高度是否增加（没有增加说明已经到底）
+SCROLL_JS = """
+const [quietMs, timeoutMs] = arguments;
+const done = arguments[arguments.length - 1];
+const startHeight = document.body.scrollHeight;
+let quietTimer = null;
+let finished = false;
+const finish = () => {
+    if (finished) return;
+    finished = true;
+    observer.disconnect();
+    clearTimeout(quietTimer);
+    clearTimeout(deadline);
+    done({height: document.body.scrollHeight, grown: document.body.scrollHeight > startHeight});
+};
+const observer = new MutationObserver(() => {
+    clearTimeout(quietTimer);
+    quietTimer = setTimeout(finish, quietMs);
+});
+observer.observe(document.body, {childList: true, subtree: true});
+const deadline = setTimeout(finish, timeoutMs);
+window.scrollTo(0, document.body.scrollHeight);
+"""
+
+# 一次 execute_script 取回标题、段落文本和图片地址，不再对每个元素单独发WebDriver请求
+EXTRACT_JS = """
+const [textSelector, imageSelector] = arguments;
+const content = [];
+for (const elem of document.querySelectorAll(textSelector)) {
+    const text = elem.innerText;
+    if (text && text.trim()) content.push(text);
+}
+const images = [];
+for (const img of document.querySelectorAll(imageSelector)) {
+    if (img.src) images.push(img.src);
+}
+return {title: document.title, content: content, images: images};
+"""
+
+
+def scroll_until_idle(driver, max_scrolls=3, max_wait=2.0, quiet_time=0.3):
+    """
+    滚动加载：每次滚动到底部后等待新内容插入完成，页面不再变高时停止
+
+    参数:
+        driver: WebDriver
+        max_scrolls: 最多滚动次数
+        max_wait: 每次滚动最多等待新内容的秒数
+        quiet_time: DOM停止变化多少秒后认为这一批内容加载完成
+
+    返回:
+        实际滚动次数
+    """
+    # 驱动可能来自 BrowserPool 被其他任务复用，用完恢复原来的脚本超时
+    previous_timeout = driver.timeouts.script
+    driver.set_script_timeout(max_wait + 5)
+    try:
+        for i in range(max_scrolls):
+            result = driver.execute_async_script(SCROLL_JS, int(quiet_time * 1000), int(max_wait * 1000))
+            if not result['grown']:
+                return i + 1
+        return max_scrolls
+    finally:
+        driver.set_script_timeout(previous_timeout)
+
+
+def extract_page_data(driver, text_selector='p', image_selector='img'):
+    """
+    提取页面标题、文本和图片地址（一次WebDriver往返）
+
+    参数:
+        driver: WebDriver
+        text_selector: 文本元素的CSS选择器
+        image_selector: 图片元素的CSS选择器
+
+    返回:
+        {'title': 标题, 'content': [文本, ...], 'images': [图片地址, ...]}
+    """
+    return driver.execute_script(EXTRACT_JS, text_selector, image_selector)
+
+
+def dynamic_content_crawler(url, output_file='dynamic_data.csv', pool=None, block_types=DEFAULT_BLOCKED_TYPES,
+                            max_scrolls=3, scroll_wait=2.0):
     """
     动态内容爬虫示例 - 处理JavaScript渲染的页面
 
     参数:
         url: 要爬取的网页URL
         output_file: 输出文件名
+        pool: 浏览器池（BrowserPool），传入时从池中借用浏览器，不再每次启动新浏览器
+        block_types: 不加载的资源类型（图片地址仍可从DOM中提取），使用浏览器池时由池统一设置
+        max_scrolls: 最多滚动次数（无限滚动页面可以调大，到底后自动停止）
+        scroll_wait: 每次滚动最多等待新内容的秒数
     """
-
-    # 配置Chrome选项
-    chrome_options = Options()
-    chrome_options.add_argument('--headless')  # 无头模式，不显示浏览器窗口
-    chrome_options.add_argument('--no-sandbox')
-    chrome_options.add_argument('--disable-dev-shm-usage')
+    if pool is not None:
+        with pool.lease() as driver:
+            _crawl_page(driver, url, output_file, max_scrolls, scroll_wait)
+        return
 
     # 初始化浏览器驱动（需要下载对应浏览器的driver）
-    driver = webdriver.Chrome(options=chrome_options)
+    driver = webdriver.Chrome(options=default_chrome_options())
+
+    try:
+        if block_types:
+            block_resources(driver, block_types)
+        _crawl_page(driver, url, output_file, max_scrolls, scroll_wait)
+    finally:
+        # 关闭浏览器
+        driver.quit()
+        print("浏览器已关闭")
+
 
+def _crawl_page(driver, url, output_file, max_scrolls=3, scroll_wait=2.0):
+    """用已打开的浏览器爬取一个页面并保存"""
     try:
         print(f"正在访问: {url}")
         driver.get(url)
@@ -36,32 +134,13 @@ def dynamic_content_crawler(url, output_file='dynamic_data.csv'):
 
         # 模拟滚动加载（针对需要滚动加载内容的页面）
         print("模拟滚动加载...")
-        last_height = driver.execute_script("return document.body.scrollHeight")
+        scrolls = scroll_until_idle(driver, max_scrolls, scroll_wait)
+        print(f"滚动 {scrolls} 次")
 
-        for i in range(3):  # 滚动3次
-            # 滚动到页面底部
-            driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-            time.sleep(2)  # 等待内容加载
-
-            # 计算新的滚动高度，如果没有变化则停止
-            new_height = driver.execute_script("return document.body.scrollHeight")
-            if new_height == last_height:
-                break
-            last_height = new_height
-
-        # 提取动态加载的内容
+        # 提取动态加载的内容（根据实际需求调整选择器）
         print("提取页面内容...")
-
-        # 获取页面标题
-        title = driver.title
-
-        # 提取所有文本内容（根据实际需求调整选择器）
-        elements = driver.find_elements(By.TAG_NAME, "p")
-        content = [elem.text for elem in elements if elem.text.strip()]
-
-        # 提取所有图片
-        images = driver.find_elements(By.TAG_NAME, "img")
-        image_urls = [img.get_attribute('src') for img in images if img.get_attribute('src')]
+        data = extract_page_data(driver)
+        title, content, image_urls = data['title'], data['content'], data['images']
 
         # 保存数据
         with open(output_file, 'w', newline='', encoding='utf-8') as file:
@@ -74,12 +153,64 @@ def dynamic_content_crawler(url, output_file='dynamic_data.csv'):
 
     except Exception as e:
         print(f"爬取过程中出错: {e}")
-    finally:
-        # 关闭浏览器
-        driver.quit()
-        print("浏览器已关闭")
+
+
+def api_json_crawler(url, output_file='api_data.jsonl', url_pattern=None, pool=None,
+                     block_types=DEFAULT_BLOCKED_TYPES + ('stylesheet',)):
+    """
+    打开页面，直接保存页面通过 XHR/fetch 请求到的JSON数据（不解析DOM）
+
+    参数:
+        url: 要爬取的网页URL
+        output_file: 输出文件（.jsonl / .csv / .parquet），每个接口响应一条记录
+        url_pattern: 只保存URL匹配的接口，如 '*/api/*'
+        pool: 浏览器池，需要以 BrowserPool(capture_network=True) 创建
+        block_types: 不加载的资源类型，使用浏览器池时由池统一设置
+
+    返回:
+        捕获到的接口响应列表
+    """
+    def capture(driver):
+        print(f"正在访问: {url}")
+        driver.get(url)
+        return capture_json(driver, url_pattern)
+
+    try:
+        if pool is not None:
+            with pool.lease() as driver:
+                responses = capture(driver)
+        else:
+            driver = webdriver.Chrome(options=default_chrome_options(capture_network=True))
+            try:
+                if block_types:
+                    block_resources(driver, block_types)
+                responses = capture(driver)
+            finally:
+                driver.quit()
+
+        with open_sink(output_file, append=False) as sink:
+            sink.write_many(responses)
+        print(f"捕获到 {len(responses)} 个接口响应，已保存到: {output_file}")
+        return responses
+
+    except Exception as e:
+        print(f"捕获接口数据出错: {e}")
+        return []
 
 
 # 使用示例
 if __name__ == "__main__":
-    dynamic_content_crawler('https://httpbin.org/html')
\ No newline at end of file
+    dynamic_content_crawler('https://httpbin.org/html')
+
+    # 无限滚动页面：最多滚动50次，每批内容插入完成后立即继续滚动，到底后自动停止
+    # dynamic_content_crawler('https://example.com/feed', max_scrolls=50)
+
+    # 爬取多个页面时复用浏览器池中的浏览器
+    # from 浏览器池 import BrowserPool
+    # with BrowserPool(size=2, tabs=2) as pool:
+    #     for i, page_url in enumerate(['https://httpbin.org/html', 'https://example.com']):
+    #         dynamic_content_crawler(page_url, f'dynamic_data_{i}.csv', pool=pool)
+    # 直接获取页面接口返回的JSON，跳过DOM解析
+    # api_json_crawler('https://example.com/list', 'api_data.jsonl', url_pattern='*/api/*')
+    # with BrowserPool(size=2, capture_network=True, block_types=('image', 'font', 'media')) as pool:
+    #     api_json_crawler('https://example.com/list', 'api_data.jsonl', url_pattern='*/api/*', pool=pool)
@@ -1,12 +1,6 @@
-import requests
+from 媒体仓库 import MediaStore
 
 url = 'https://img-s.msn.cn/tenant/amp/entityid/AA13c1OB.img'
-header={
-    'User-Agent':'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/128.0.0.0 Safari/537.36 Edg/128.0.0.0'
-}
-#发送请求获取响应信息
-response = requests.get(url=url,headers = header)
-
-#将返回的相应信息的内容写入到一个图片文件
-with open ("baidu.jpg", 'wb') as f:
-    f.write(response.content)
\ No newline at end of file
+#通过媒体仓库下载：内容没有变化时不会重复下载，文件名冲突时不会覆盖
+with MediaStore('media_store') as store:
+    store.fetch(url, "baidu.jpg")
\ No newline at end of file
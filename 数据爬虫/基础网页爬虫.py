@@ -1,27 +1,24 @@
 import requests
-from bs4 import BeautifulSoup
 import time
 import csv
+from HTTP客户端 import get_session
+from HTML解析器 import get_parser
 
 
-def basic_web_crawler(url, output_file='data.csv'):
+def basic_web_crawler(url, output_file='data.csv', parser=None):
     """
     基础网页爬虫示例 - 爬取网页标题和内容
 
     参数:
         url: 要爬取的网页URL
         output_file: 输出CSV文件名
+        parser: HTML解析后端 'lxml' / 'bs4-lxml' / 'html.parser'，默认使用可用的最快后端
     """
 
-    # 设置请求头，模拟浏览器访问
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-    }
-
     try:
-        # 发送HTTP GET请求
+        # 发送HTTP GET请求（共享会话已设置模拟浏览器的请求头和超时）
         print(f"正在爬取: {url}")
-        response = requests.get(url, headers=headers, timeout=10)
+        response = get_session().get(url)
 
         # 检查请求是否成功
         response.raise_for_status()  # 如果状态码不是200，抛出异常
@@ -29,16 +26,18 @@ def basic_web_crawler(url, output_file='data.csv'):
         # 设置编码（根据网页实际情况调整）
         response.encoding = 'utf-8'
 
-        # 使用BeautifulSoup解析HTML内容
-        soup = BeautifulSoup(response.text, 'html.parser')
+        # 解析HTML内容
+        parser = get_parser(parser)
+        root = parser.parse(response.text)
 
         # 提取网页标题
-        title = soup.title.string if soup.title else "无标题"
+        title_element = parser.select_one(root, 'title')
+        title = parser.text(title_element) if title_element is not None else "无标题"
         print(f"网页标题: {title}")
 
         # 提取所有段落文本（根据实际网页结构调整选择器）
-        paragraphs = soup.find_all('p')
-        content = ' '.join([p.get_text().strip() for p in paragraphs])
+        paragraphs = parser.select(root, 'p')
+        content = ' '.join([parser.text(p).strip() for p in paragraphs])
 
         # 保存数据到CSV文件
         with open(output_file, 'w', newline='', encoding='utf-8') as file:
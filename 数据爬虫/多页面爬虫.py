@@ -1,11 +1,11 @@
-import requests
-from bs4 import BeautifulSoup
-import time
-import csv
 import os
+from HTTP客户端 import get_session
+from 限速器 import HostRateLimiter
+from HTML解析器 import get_parser
+from 数据输出 import CsvSink
 
 
-def multi_page_crawler(base_url, pages=5, output_dir='output'):
+def multi_page_crawler(base_url, pages=5, output_dir='output', requests_per_second=1.0, parser=None):
     """
     多页面爬虫示例 - 爬取分页内容
 
@@ -13,59 +13,53 @@ def multi_page_crawler(base_url, pages=5, output_dir='output'):
         base_url: 基础URL，包含页码占位符
         pages: 要爬取的页数
         output_dir: 输出目录
+        requests_per_second: 每个主机每秒允许的请求数
+        parser: HTML解析后端 'lxml' / 'bs4-lxml' / 'html.parser'，默认使用可用的最快后端
     """
 
     # 创建输出目录
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
 
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-    }
+    # 按主机限速，避免请求过快
+    rate_limiter = HostRateLimiter(rate=requests_per_second)
+    parser = get_parser(parser)
 
-    all_data = []
-
-    for page in range(1, pages + 1):
-        try:
-            # 构建每一页的URL（根据实际网站结构调整）
-            url = base_url.format(page=page)
-            print(f"正在爬取第 {page} 页: {url}")
-
-            response = requests.get(url, headers=headers, timeout=10)
-            response.raise_for_status()
-            response.encoding = 'utf-8'
-
-            soup = BeautifulSoup(response.text, 'html.parser')
+    # 边爬边写入CSV，中途出错时已爬取的页面不会丢失
+    output_file = os.path.join(output_dir, 'all_pages_data.csv')
+    with CsvSink(output_file, fieldnames=['text', 'url'], append=False) as sink:
+        for page in range(1, pages + 1):
+            try:
+                # 构建每一页的URL（根据实际网站结构调整）
+                url = base_url.format(page=page)
+                print(f"正在爬取第 {page} 页: {url}")
 
-            # 提取页面中的数据（这里以提取所有链接为例）
-            links = soup.find_all('a', href=True)
-            page_data = []
+                rate_limiter.wait(url)
+                response = get_session().get(url)
+                response.raise_for_status()
+                response.encoding = 'utf-8'
 
-            for link in links:
-                text = link.get_text().strip()
-                href = link['href']
-                if text and href.startswith('http'):  # 只保存有文本且是完整URL的链接
-                    page_data.append({'text': text, 'url': href})
+                root = parser.parse(response.text)
 
-            all_data.extend(page_data)
-            print(f"第 {page} 页爬取完成，找到 {len(page_data)} 个链接")
+                # 提取页面中的数据（这里以提取所有链接为例）
+                links = parser.select(root, 'a[href]')
+                page_data = []
 
-            # 延迟，避免请求过快
-            time.sleep(1)
+                for link in links:
+                    text = parser.text(link).strip()
+                    href = parser.attr(link, 'href')
+                    if text and href.startswith('http'):  # 只保存有文本且是完整URL的链接
+                        page_data.append({'text': text, 'url': href})
 
-        except Exception as e:
-            print(f"爬取第 {page} 页时出错: {e}")
-            continue
+                sink.write_many(page_data)
+                print(f"第 {page} 页爬取完成，找到 {len(page_data)} 个链接")
 
-    # 保存所有数据
-    output_file = os.path.join(output_dir, 'all_pages_data.csv')
-    with open(output_file, 'w', newline='', encoding='utf-8') as file:
-        writer = csv.DictWriter(file, fieldnames=['text', 'url'])
-        writer.writeheader()
-        writer.writerows(all_data)
+            except Exception as e:
+                print(f"爬取第 {page} 页时出错: {e}")
+                continue
 
     print(f"所有数据已保存到: {output_file}")
-    print(f"总共爬取 {len(all_data)} 条数据")
+    print(f"总共爬取 {sink.count} 条数据")
 
 
 # 使用示例
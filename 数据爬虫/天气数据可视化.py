@@ -1,35 +1,30 @@
-import pandas as pd
 from pyecharts import  options as opts
 from pyecharts.charts import Bar,Timeline
 import numpy
+import os
+from 天气数据聚合 import WeatherStats
+from 天气数据存储 import WeatherStore
 print(numpy.__file__)  # 例如：D:\anaconda\envs\DL\lib\site-packages\numpy\__init__.py
-#用pandas.read_csv()读取指定的excel文件，选择编码格式gb18030
+#读取爬取的weather.csv，编码格式gb18030；日期一次性解析，天气按月统计一次后缓存
 
-df=pd.read_csv('weather.csv', encoding='gb18030')
-#print(df['日期'])
+if os.path.exists('weather_parquet'):
+    #有Parquet数据集时只读取北京2023年的分区
+    stats=WeatherStats(WeatherStore('weather_parquet').read(cities=['beijing'], years=[2023]))
+else:
+    stats=WeatherStats.from_csv('weather.csv', encoding='gb18030')
+    #数据中有多个城市、多个年份时，只画北京2023年
+    stats=stats.select(city='beijing', year=2023)
 
-df['日期']=df['日期'].apply(lambda x:pd.to_datetime(x))
+print(stats.monthly_counts)
 
-df['month']=df['日期'].dt.month
-
-df_agg=df.groupby(['month','天气']).size().reset_index()
-print(df_agg)
-
-df_agg.columns=['month','tianqi','count']
-print(df_agg)
-
-print(df_agg[df_agg['month']==1][['tianqi','count']].sort_values(by='count',ascending=False).values.tolist())
+print(stats.month_data(1, ascending=False))
 
 #实例化一个时间序列的对象
 timeline=Timeline()
 #播放参数：设置时间间隔2秒 单位是：ms
 timeline.add_schema(play_interval=2000)
 
-for month in df_agg['month'].unique():
-    data=(
-        df_agg[df_agg['month']==month][['tianqi','count']]
-    .sort_values(by='count',ascending=True).values.tolist()
-    )
+for month, data in stats.monthly_sorted.items():
     print(data)
 
     #绘制柱状图
@@ -46,13 +41,9 @@ for month in df_agg['month'].unique():
     bar.set_series_opts(label_opts=opts.LabelOpts(position='right'))
 
     # 设置下图标名称
-    bar.set_global_opts(title_opts=opts.TitleOpts(title='北京2024年每月天气变化'))
+    bar.set_global_opts(title_opts=opts.TitleOpts(title='北京2023年每月天气变化'))
 
     timeline.add(bar,f'{month}月')
 
 #将设置好的图表保存为"weather.html"文件
 timeline.render('weather.html')
-
-
-
-
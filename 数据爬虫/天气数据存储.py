@@ -0,0 +1,208 @@
+"""
+天气数据存储 - 按 城市/年/月 分区的Parquet数据集
+
+目录结构（hive分区）:
+    weather_parquet/城市=beijing/year=2023/month=1/data.parquet
+
+    每个月一个文件，重新爬取某个月时只替换这个月的文件；
+    已经结束的月份爬取成功后在文件元数据中标记为完整，update() 只爬取还没有完整保存的月份
+    （网站上个别日期缺失的月份同样会被标记为完整，不会每次都重新爬取）；
+    read() 按城市/年/月筛选时只打开匹配的分区目录；
+    列类型紧凑：日期 date32，气温 int16，天气使用字典编码。
+"""
+import os
+import calendar
+import datetime
+import itertools
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from 天气数据爬取 import month_pages, crawl_months
+
+# 文件中保存的列（城市、年、月由目录名表示）
+FILE_SCHEMA = pa.schema([
+    ('日期', pa.date32()),
+    ('最高气温', pa.int16()),
+    ('最低气温', pa.int16()),
+    ('天气', pa.dictionary(pa.int16(), pa.string())),
+])
+
+# 文件元数据中的完整标记
+COMPLETE_KEY = b'weather_complete'
+
+PARTITIONING = ds.partitioning(
+    pa.schema([('城市', pa.string()), ('year', pa.int16()), ('month', pa.int8())]),
+    flavor='hive'
+)
+
+
+class WeatherStore:
+    """
+    天气Parquet数据集
+    """
+
+    def __init__(self, root='weather_parquet'):
+        """
+        初始化
+
+        参数:
+            root: 数据集根目录
+        """
+        self.root = root
+
+    def _month_dir(self, city, year, month):
+        return os.path.join(self.root, f'城市={city}', f'year={year}', f'month={month}')
+
+    def _month_file(self, city, year, month):
+        return os.path.join(self._month_dir(city, year, month), 'data.parquet')
+
+    def is_complete(self, city, year, month):
+        """
+        某个月的数据是否已经完整保存（看文件元数据中的完整标记，不读数据）
+        """
+        path = self._month_file(city, year, month)
+        if not os.path.exists(path):
+            return False
+        metadata = pq.read_schema(path).metadata or {}
+        return metadata.get(COMPLETE_KEY) == b'1'
+
+    @staticmethod
+    def month_ended(year, month):
+        """这个月是否已经结束（还没结束的月份数据会继续增加，不能标记为完整）"""
+        last_day = datetime.date(year, month, calendar.monthrange(year, month)[1])
+        return last_day < datetime.date.today()
+
+    def write_month(self, city, year, month, days, complete=None):
+        """
+        写入（替换）一个月的数据
+
+        参数:
+            city: 城市
+            year: 年
+            month: 月
+            days: 当月每天的记录 [{'date_time', 'high', 'low', 'weather'}, ...]
+            complete: 是否标记为完整（之后 update() 不再爬取），默认这个月已经结束、
+                      并且每一天都有记录时才标记（网站还没发布最后几天时，下次 update() 会重新爬取）
+        """
+        if complete is None:
+            days_in_month = calendar.monthrange(year, month)[1]
+            complete = (self.month_ended(year, month)
+                        and len({day['date_time'] for day in days}) >= days_in_month)
+
+        table = pa.table({
+            '日期': pa.array([day['date_time'] for day in days], pa.date32()),
+            '最高气温': pa.array([day['high'] for day in days], pa.int16()),
+            '最低气温': pa.array([day['low'] for day in days], pa.int16()),
+            '天气': pa.array([day['weather'] for day in days], FILE_SCHEMA.field('天气').type),
+        }, schema=FILE_SCHEMA.with_metadata({COMPLETE_KEY: b'1' if complete else b'0'}))
+
+        path = self._month_file(city, year, month)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        # 先写临时文件再替换，中断时不会留下损坏的分区；
+        # 临时文件以 . 开头，读取数据集时会被忽略，即使进程在替换前崩溃也不影响读取
+        tmp_path = os.path.join(directory, '.data.parquet.tmp')
+        pq.write_table(table, tmp_path, compression='zstd')
+        os.replace(tmp_path, path)
+
+    def append(self, records):
+        """
+        写入爬取结果（按城市、年月分组，每凑齐一个月写一个分区）
+
+        参数:
+            records: 天气记录（可迭代对象），如 crawl_weather() 的结果，需要按城市、年月顺序排列
+
+        返回:
+            写入的月份数
+        """
+        def month_key(record):
+            date = record['date_time']
+            return record['city'], date.year, date.month
+
+        months = 0
+        for (city, year, month), days in itertools.groupby(records, key=month_key):
+            self.write_month(city, year, month, list(days))
+            months += 1
+        return months
+
+    def update(self, cities, years, months=range(1, 13), max_workers=8, requests_per_second=5.0):
+        """
+        增量更新：只爬取数据集中缺少或还没标记为完整的月份
+
+        每个月爬取成功后立即写入；重试后仍失败的月份不写入，其他月份写完后抛出 RuntimeError 列出这些月份，
+        下次运行会重新爬取。
+
+        参数:
+            cities: 城市拼音列表
+            years: 年份列表
+            months: 月份列表
+            max_workers: 同时请求的页面数
+            requests_per_second: 每秒允许的请求数
+
+        返回:
+            写入的月份数
+        """
+        pages = [page for page in month_pages(cities, years, months) if not self.is_complete(*page[:3])]
+        print(f"需要爬取 {len(pages)} 个月")
+
+        written = 0
+        failed = []
+        for (city, year, month, _), days, error in crawl_months(pages, max_workers, requests_per_second):
+            if error is not None:
+                failed.append(f'{city} {year}-{month:02d}')
+                continue
+            self.write_month(city, year, month, days)
+            written += 1
+            print(f"{city} {year}年{month}月 已保存，{len(days)} 天")
+
+        if failed:
+            raise RuntimeError(f"{len(failed)} 个月爬取失败，下次运行会重新爬取: {', '.join(failed[:20])}"
+                               + (' ……' if len(failed) > 20 else ''))
+        return written
+
+    def dataset(self):
+        """整个数据集（pyarrow.dataset.Dataset），用于自定义查询"""
+        return ds.dataset(self.root, format='parquet', partitioning=PARTITIONING)
+
+    def read(self, cities=None, years=None, months=None, columns=None):
+        """
+        读取数据，按城市/年/月筛选时只读取匹配的分区
+
+        参数:
+            cities: 城市列表，为None时不筛选
+            years: 年份列表，为None时不筛选
+            months: 月份列表，为None时不筛选
+            columns: 要读取的列，为None时读取全部列
+
+        返回:
+            pandas.DataFrame（日期为datetime64，天气为category）
+        """
+        if not os.path.exists(self.root):
+            raise FileNotFoundError(f"数据集不存在: {self.root}")
+
+        conditions = []
+        if cities is not None:
+            conditions.append(ds.field('城市').isin(list(cities)))
+        if years is not None:
+            conditions.append(ds.field('year').isin(list(years)))
+        if months is not None:
+            conditions.append(ds.field('month').isin(list(months)))
+
+        expression = None
+        for condition in conditions:
+            expression = condition if expression is None else expression & condition
+
+        table = self.dataset().to_table(columns=columns, filter=expression)
+        return table.to_pandas(date_as_object=False)
+
+
+# 使用示例
+if __name__ == "__main__":
+    store = WeatherStore('weather_parquet')
+
+    # 第一次运行爬取全部月份，之后每次只爬取新的月份（以及还没结束的当月）
+    store.update(['beijing', 'shanghai'], range(2014, datetime.date.today().year + 1), max_workers=16)
+
+    # 只读取北京2023年的分区
+    # df = store.read(cities=['beijing'], years=[2023])
+    # print(df.head())
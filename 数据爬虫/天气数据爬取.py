@@ -1,52 +1,197 @@
-import requests
 from lxml import etree
-import csv
+import re
+import datetime
+import concurrent.futures
+from HTTP客户端 import create_session, get_session
+from 限速器 import HostRateLimiter
+from 数据输出 import CsvSink
+from 分页引擎 import ordered_window
 
+# 预编译的XPath：每个页面、每一天都直接复用，不再重复解析表达式
+DAY_ITEMS = etree.XPath("//ul[@class='thrui']/li")
+DAY_DATE = etree.XPath("string(./div[1])")
+DAY_HIGH = etree.XPath("string(./div[2])")
+DAY_LOW = etree.XPath("string(./div[3])")
+DAY_WEATHER = etree.XPath("string(./div[4])")
 
-def getweather(url):
+TEMPERATURE = re.compile(r'-?\d+')
+
+# 输出CSV的列名
+CSV_COLUMNS = {
+    'city': '城市',
+    'date_time': '日期',
+    'high': '最高气温',
+    'low': '最低气温',
+    'weather': '天气',
+}
+
+
+def _parse_temperature(text):
+    """'12℃' -> 12，没有数字时返回None"""
+    match = TEMPERATURE.search(text)
+    return int(match.group()) if match else None
+
+
+def getweather(url, session=None):
+    """
+    爬取一个月的历史天气
+
+    参数:
+        url: 月份页面URL，如 https://lishi.tianqi.com/beijing/202301.html
+        session: 请求会话，默认使用共享会话
+
+    返回:
+        [{'date_time': datetime.date, 'high': int, 'low': int, 'weather': str}, ...]
+    """
     weather_info = [] #新建一个列表，将爬取的每月数据放进去
-    #请求头信息：浏览器版本型号，接收数据的编码格式
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/136.0.0.0 Safari/537.36'}
-    #请求
-    resp = requests.get(url, headers=headers)
+    #请求（共享会话已设置浏览器请求头，并复用同一个长连接）
+    resp = (session or get_session()).get(url)
+    resp.raise_for_status()
     #数据预处理
     resp_html=etree.HTML(resp.text)
-    #xpath提取所有数据
-    resp_list=resp_html.xpath("//ul[@class='thrui']/li")
-    #print(resp_list)
+    if resp_html is None:
+        return weather_info
 
     #for循环迭代遍历
-    for li in resp_list :
-        day_weather_info={}
-        day_weather_info['date_time']=li.xpath("./div[1]/text()")[0].split(' ')[0]
-        high=li.xpath("./div[2]/text()")[0]
-        day_weather_info['high']=high[:high.find('C')]
+    for li in DAY_ITEMS(resp_html):
+        date_text = DAY_DATE(li).strip().split(' ')[0]
+        try:
+            date_time = datetime.date.fromisoformat(date_text)
+        except ValueError:
+            continue
 
-        low=li.xpath("./div[3]/text()")[0]
-        day_weather_info['low'] = low[:low.find('C')]
+        weather_info.append({
+            'date_time': date_time,
+            'high': _parse_temperature(DAY_HIGH(li)),
+            'low': _parse_temperature(DAY_LOW(li)),
+            'weather': DAY_WEATHER(li).strip(),
+        })
 
-        day_weather_info['weather']=li.xpath("./div[4]/text()")[0]
+    return weather_info
 
-        weather_info.append(day_weather_info)
 
-    return weather_info
+def month_pages(cities, years, months=range(1, 13)):
+    """
+    生成要爬取的月份页面 (城市, 年, 月, URL)，跳过还没到的月份
+
+    参数:
+        cities: 城市拼音列表，如 ['beijing', 'shanghai']
+        years: 年份列表，如 range(2014, 2024)
+        months: 月份列表
+    """
+    today = datetime.date.today()
+    for city in cities:
+        for year in years:
+            for month in months:
+                if datetime.date(year, month, 1) > today:
+                    continue
+                yield city, year, month, f'https://lishi.tianqi.com/{city}/{year}{month:02d}.html'
+
+
+def crawl_months(pages, max_workers=8, requests_per_second=5.0, retries=3):
+    """
+    并发爬取月份页面，按页面顺序逐月产出（生成器）
+
+    同时在途的页面不超过 max_workers*2 个（见 分页引擎.ordered_window），
+    页面再多也不会一次性提交，一个慢页面也不会让后面的结果无限堆积。
+
+    参数:
+        pages: (城市, 年, 月, URL) 的可迭代对象，如 month_pages() 的结果
+        max_workers: 同时请求的页面数
+        requests_per_second: 每秒允许的请求数
+        retries: 每个页面的重试次数
+
+    产出:
+        ((城市, 年, 月, URL), 当月每天的记录, 错误)：成功时错误为None，重试后仍失败时记录为空列表
+    """
+    session = create_session(
+        concurrency=max_workers,
+        rate_limiter=HostRateLimiter(rate=requests_per_second, burst=max_workers)
+    )
+
+    def fetch(page):
+        city, year, month, url = page
+        for attempt in range(retries):
+            try:
+                return getweather(url, session), None
+            except Exception as e:
+                if attempt == retries - 1:
+                    print(f"爬取 {city} {year}年{month}月 失败: {e}")
+                    return [], e
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for page, (days, error) in ordered_window(executor, fetch, pages, max_workers * 2):
+            yield page, days, error
+
+
+def crawl_pages(pages, max_workers=8, requests_per_second=5.0):
+    """
+    并发爬取月份页面，按页面顺序逐天产出（生成器）
+
+    某些月份重试后仍失败时，其余月份照常产出，全部结束后抛出 RuntimeError 列出失败的月份，
+    不会把失败的月份当作没有数据静默跳过。
+
+    参数:
+        pages: (城市, 年, 月, URL) 的可迭代对象，如 month_pages() 的结果
+        max_workers: 同时请求的页面数
+        requests_per_second: 每秒允许的请求数
+
+    产出:
+        {'city': str, 'date_time': datetime.date, 'high': int, 'low': int, 'weather': str}
+    """
+    failed = []
+    for (city, year, month, _), days, error in crawl_months(pages, max_workers, requests_per_second):
+        if error is not None:
+            failed.append(f'{city} {year}-{month:02d}')
+            continue
+        for day in days:
+            day['city'] = city
+            yield day
+        print(f"{city} {year}年{month}月 完成，{len(days)} 天")
+
+    if failed:
+        raise RuntimeError(f"{len(failed)} 个月爬取失败: {', '.join(failed[:20])}"
+                           + (' ……' if len(failed) > 20 else ''))
+
+
+def crawl_weather(cities, years, months=range(1, 13), max_workers=8, requests_per_second=5.0):
+    """
+    并发爬取多个城市、多个年份的历史天气，按城市、年月顺序逐天产出（生成器）
+
+    有月份失败时，其余数据产出完后抛出 RuntimeError（见 crawl_pages）。
 
-weathers=[]
-for month in range(1,13):
-    weather_time ='2023'+('0'+str(month) if month <10 else str(month))
+    参数:
+        cities: 城市拼音列表
+        years: 年份列表
+        months: 月份列表
+        max_workers: 同时请求的页面数
+        requests_per_second: 每秒允许的请求数
+    """
+    yield from crawl_pages(month_pages(cities, years, months), max_workers, requests_per_second)
 
-    url=f'https://lishi.tianqi.com/beijing/{weather_time}.html'
-    weather=getweather(url)
 
-    weathers.append(weather)
+def save_weather_csv(records, output_file='weather.csv'):
+    """
+    把天气数据边爬边写入CSV（gb18030编码，可视化脚本按此编码读取）
 
-print(weathers)
+    参数:
+        records: 天气记录（可迭代对象）
+        output_file: 输出文件
 
-with open("weather.csv", "w", newline='') as csvfile:
-    writer = csv.writer(csvfile)
+    返回:
+        写入的记录数
+    """
+    with CsvSink(output_file, fieldnames=list(CSV_COLUMNS.values()), flush_size=1000,
+                 append=False, encoding='gb18030') as sink:
+        for record in records:
+            sink.write({CSV_COLUMNS[key]: value for key, value in record.items()})
+    return sink.count
 
-    writer.writerow(["日期","最高气温","最低气温","天气"])
 
-    writer.writerows([list(day_weather_dict.values()) for month_weather in weathers for day_weather_dict in month_weather])
+# 使用示例
+if __name__ == "__main__":
+    count = save_weather_csv(crawl_weather(['beijing'], [2023]))
+    print(f"共保存 {count} 天的天气数据")
 
+    # 多个城市、十年数据
+    # save_weather_csv(crawl_weather(['beijing', 'shanghai', 'guangzhou'], range(2014, 2024), max_workers=16, requests_per_second=10))
@@ -0,0 +1,107 @@
+"""
+天气数据聚合 - 为可视化提供按月统计的天气数据
+
+    日期一次性向量化解析，天气、城市转为分类类型（category）；
+    每月各种天气出现的天数用一次 crosstab 算出，不再每个月重新筛选整张表；
+    按月排好序的结果和按城市/年份筛选出的子集都会缓存，多次绘图直接复用。
+"""
+import functools
+import pandas as pd
+
+
+def prepare_weather(df):
+    """
+    整理天气数据的类型
+
+    参数:
+        df: 包含 日期、天气 列（可选 城市 列）的DataFrame
+
+    返回:
+        新的DataFrame，日期为datetime64，天气/城市为category，增加 year、month 列
+    """
+    df = df.copy()
+    if not pd.api.types.is_datetime64_any_dtype(df['日期']):
+        df['日期'] = pd.to_datetime(df['日期'])
+    df['天气'] = df['天气'].astype('category')
+    if '城市' in df.columns:
+        df['城市'] = df['城市'].astype('category')
+    df['year'] = df['日期'].dt.year.astype('int16')
+    df['month'] = df['日期'].dt.month.astype('int8')
+    return df
+
+
+class WeatherStats:
+    """
+    天气统计 - 按月统计各种天气出现的天数
+    """
+
+    def __init__(self, df, prepared=False):
+        """
+        初始化
+
+        参数:
+            df: 天气数据DataFrame
+            prepared: df是否已经由 prepare_weather 整理过
+        """
+        self.df = df if prepared else prepare_weather(df)
+        self._subsets = {}
+
+    @classmethod
+    def from_csv(cls, path='weather.csv', encoding='gb18030'):
+        """
+        从爬取的CSV文件读取
+
+        参数:
+            path: CSV文件路径
+            encoding: 文件编码
+        """
+        return cls(pd.read_csv(path, encoding=encoding))
+
+    def select(self, city=None, year=None):
+        """
+        按城市/年份筛选（结果缓存，重复筛选直接返回同一个对象）
+
+        参数:
+            city: 城市，为None或数据中没有城市列时不筛选
+            year: 年份，为None时不筛选
+        """
+        key = (city, year)
+        if key not in self._subsets:
+            mask = pd.Series(True, index=self.df.index)
+            if city is not None and '城市' in self.df.columns:
+                mask &= self.df['城市'] == city
+            if year is not None:
+                mask &= self.df['year'] == year
+            self._subsets[key] = WeatherStats(self.df[mask], prepared=True)
+        return self._subsets[key]
+
+    @functools.cached_property
+    def monthly_counts(self):
+        """每月各种天气的天数（行为月份，列为天气）"""
+        return pd.crosstab(self.df['month'], self.df['天气'])
+
+    @functools.cached_property
+    def monthly_sorted(self):
+        """
+        每月按天数升序排列的 [天气, 天数] 列表（天数为0的天气不包含在内）
+
+        返回:
+            {月份: [[天气, 天数], ...]}
+        """
+        result = {}
+        for month, row in self.monthly_counts.iterrows():
+            row = row[row > 0].sort_values(kind='stable')
+            # 转为Python内置类型，图表库可以直接序列化
+            result[int(month)] = [[str(weather), int(count)] for weather, count in row.items()]
+        return result
+
+    def month_data(self, month, ascending=True):
+        """
+        某个月按天数排序的 [天气, 天数] 列表
+
+        参数:
+            month: 月份
+            ascending: 是否升序
+        """
+        data = self.monthly_sorted.get(month, [])
+        return data if ascending else data[::-1]
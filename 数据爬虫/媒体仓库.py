@@ -0,0 +1,208 @@
+import os
+import shutil
+import sqlite3
+import hashlib
+import threading
+from datetime import datetime
+from 分段下载器 import probe_range_support, ranged_download
+
+
+class MediaStore:
+    """
+    内容寻址媒体仓库 - 按sha256存储下载的音频/视频/图片，跨多次运行去重
+
+    目录结构:
+        <root>/objects/ab/abcdef...   以sha256命名的文件内容
+        <root>/tmp/                   下载中的临时文件（支持断点续传）
+        <root>/index.db               SQLite索引：URL + ETag + Content-Length -> sha256
+
+    用户看到的输出文件是仓库中对象的硬链接（不支持硬链接时退回复制），
+    同一内容在磁盘上只存一份。URL的ETag（没有时用Last-Modified）和大小与上次一致时，不下载任何数据直接复用；
+    服务器两者都不返回时无法判断内容是否变化，每次都重新下载（内容相同时仍只存一份）。
+    """
+
+    def __init__(self, root='media_store'):
+        self.root = root
+        self.objects_dir = os.path.join(root, 'objects')
+        self.tmp_dir = os.path.join(root, 'tmp')
+        os.makedirs(self.objects_dir, exist_ok=True)
+        os.makedirs(self.tmp_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(root, 'index.db'), check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS media ('
+                'url TEXT PRIMARY KEY, etag TEXT, content_length INTEGER, '
+                'sha256 TEXT NOT NULL, fetched_at TEXT)'
+            )
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS links ('
+                'path TEXT PRIMARY KEY, url TEXT, sha256 TEXT NOT NULL)'
+            )
+
+    def object_path(self, sha256):
+        """sha256对应的对象文件路径"""
+        return os.path.join(self.objects_dir, sha256[:2], sha256)
+
+    def lookup(self, url, etag='', content_length=0):
+        """
+        查询URL是否已下载过且内容未变化
+
+        参数:
+            url: 文件URL
+            etag: 服务器返回的校验值（ETag，没有时为Last-Modified）
+            content_length: 服务器返回的文件大小
+
+        返回:
+            已存在时返回sha256，否则返回None
+        """
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT etag, content_length, sha256 FROM media WHERE url = ?', (url,)
+            ).fetchone()
+
+        if not row:
+            return None
+
+        stored_etag, stored_length, sha256 = row
+        # 必须有校验值（ETag或Last-Modified）才能复用：只比较大小时，同样大小的新内容会被误认为没有变化
+        if not etag:
+            return None
+        unchanged = etag == stored_etag and (not content_length or content_length == stored_length)
+
+        if unchanged and os.path.exists(self.object_path(sha256)):
+            return sha256
+        return None
+
+    def ingest(self, file_path, url=None, etag='', content_length=0):
+        """
+        把下载好的文件移入仓库并登记索引
+
+        参数:
+            file_path: 已下载的文件（会被移动或删除）
+            url: 文件URL，为None时只存储不登记
+            etag: 服务器返回的校验值（ETag，没有时为Last-Modified）
+            content_length: 服务器返回的文件大小
+
+        返回:
+            文件内容的sha256
+        """
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        sha256 = digest.hexdigest()
+
+        target = self.object_path(sha256)
+        if os.path.exists(target):
+            # 其他URL已下载过相同内容
+            os.remove(file_path)
+        else:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(file_path, target)
+
+        if url:
+            with self._lock, self._conn:
+                self._conn.execute(
+                    'INSERT OR REPLACE INTO media (url, etag, content_length, sha256, fetched_at) '
+                    'VALUES (?, ?, ?, ?, ?)',
+                    (url, etag, content_length or os.path.getsize(target), sha256,
+                     datetime.now().isoformat(timespec='seconds'))
+                )
+        return sha256
+
+    def link(self, sha256, output_path, url=None):
+        """
+        在输出路径创建指向仓库对象的硬链接
+
+        输出路径已被其他URL或用户自己的文件占用时，不覆盖，而是在文件名后加上内容哈希前缀。
+
+        参数:
+            sha256: 对象的sha256
+            output_path: 用户期望的输出路径
+            url: 对应的URL
+
+        返回:
+            实际写入的输出路径
+        """
+        source = self.object_path(sha256)
+        output_path = os.path.abspath(output_path)
+
+        if os.path.exists(output_path):
+            with self._lock:
+                row = self._conn.execute(
+                    'SELECT url FROM links WHERE path = ?', (output_path,)
+                ).fetchone()
+
+            if os.path.samefile(source, output_path):
+                return output_path
+            if row and row[0] == url:
+                # 同一URL的内容更新了，替换旧链接
+                os.remove(output_path)
+            else:
+                # 文件名冲突，加上哈希前缀区分
+                base, ext = os.path.splitext(output_path)
+                output_path = f'{base}_{sha256[:8]}{ext}'
+                if os.path.exists(output_path):
+                    return output_path
+
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        try:
+            os.link(source, output_path)
+        except OSError:
+            # 跨磁盘或文件系统不支持硬链接时退回复制
+            shutil.copy2(source, output_path)
+
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO links (path, url, sha256) VALUES (?, ?, ?)',
+                (output_path, url, sha256)
+            )
+        return output_path
+
+    def fetch(self, url, output_path, headers=None, connections=4):
+        """
+        下载文件到输出路径；内容未变化时跳过下载，直接链接已有对象
+
+        参数:
+            url: 文件URL
+            output_path: 输出文件路径
+            headers: 请求头
+            connections: 分段下载的并行连接数
+
+        返回:
+            实际写入的输出路径
+        """
+        _, content_length, etag = probe_range_support(url, headers)
+
+        sha256 = self.lookup(url, etag, content_length)
+        if sha256:
+            print(f"内容未变化，跳过下载: {url}")
+            return self.link(sha256, output_path, url)
+
+        # 临时文件名由URL决定，中断后重新运行可以续传
+        tmp_name = hashlib.sha256(url.encode('utf-8')).hexdigest() + '.part'
+        tmp_path = os.path.join(self.tmp_dir, tmp_name)
+        ranged_download(url, tmp_path, headers=headers, connections=connections)
+
+        sha256 = self.ingest(tmp_path, url, etag, content_length)
+        return self.link(sha256, output_path, url)
+
+    def close(self):
+        """关闭索引数据库"""
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+# 使用示例
+if __name__ == "__main__":
+    # 第二次运行时，内容未变化的文件不会重新下载
+    # with MediaStore('media_store') as store:
+    #     store.fetch('https://example.com/a.mp3', 'audio_downloads/a.mp3')
+    pass
@@ -1,7 +1,11 @@
 import requests
 import json
-import time
 import pandas as pd
+import concurrent.futures
+from HTTP客户端 import create_session
+from 限速器 import HostRateLimiter
+from 分页引擎 import paginate, PagePagination
+from 令牌管理 import OAuth2TokenManager, OAuth2Auth
 from datetime import datetime, timedelta
 
 
@@ -10,25 +14,24 @@ class APICrawlerWithAuth:
     带认证的API数据爬虫 - 适用于需要登录或API密钥的网站
     """
 
-    def __init__(self, base_url, auth_type='token', credentials=None):
+    def __init__(self, base_url, auth_type='token', credentials=None, requests_per_second=1.0, burst=1):
         """
         初始化
 
         参数:
             base_url: API基础URL
             auth_type: 认证类型 ('token', 'basic', 'oauth2')
-            credentials: 认证凭据
+            credentials: 认证凭据，oauth2需要 token_url、client_id，
+                         可选 client_secret、refresh_token、scope、cache_path
+            requests_per_second: 每个主机每秒允许的请求数（礼貌限速）
+            burst: 每个主机允许的突发请求数
         """
         self.base_url = base_url
         self.auth_type = auth_type
         self.credentials = credentials or {}
-        self.session = requests.Session()
-
-        # 设置通用请求头
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
-            'Accept': 'application/json'
-        })
+        # 独立会话：认证信息只属于这个爬虫，通用请求头和连接池由HTTP客户端统一提供
+        self.rate_limiter = HostRateLimiter(rate=requests_per_second, burst=burst)
+        self.session = create_session(headers={'Accept': 'application/json'}, rate_limiter=self.rate_limiter)
 
         # 根据认证类型设置认证
         self._setup_auth()
@@ -46,6 +49,18 @@ class APICrawlerWithAuth:
             if username and password:
                 self.session.auth = (username, password)
 
+        elif self.auth_type == 'oauth2':
+            # 令牌由令牌管理器统一获取、缓存和提前刷新，多个线程/进程共用；收到401时自动换令牌重试
+            self.token_manager = OAuth2TokenManager(
+                token_url=self.credentials['token_url'],
+                client_id=self.credentials['client_id'],
+                client_secret=self.credentials.get('client_secret'),
+                refresh_token=self.credentials.get('refresh_token'),
+                scope=self.credentials.get('scope'),
+                cache_path=self.credentials.get('cache_path'),
+            )
+            self.session.auth = OAuth2Auth(self.token_manager, self.session)
+
     def make_request(self, endpoint, method='GET', params=None, data=None):
         """
         发送API请求
@@ -60,9 +75,9 @@ class APICrawlerWithAuth:
 
         try:
             if method.upper() == 'GET':
-                response = self.session.get(url, params=params, timeout=10)
+                response = self.session.get(url, params=params)
             elif method.upper() == 'POST':
-                response = self.session.post(url, json=data, timeout=10)
+                response = self.session.post(url, json=data)
             else:
                 raise ValueError(f"不支持的HTTP方法: {method}")
 
@@ -73,84 +88,175 @@ class APICrawlerWithAuth:
             print(f"API请求失败: {e}")
             return None
 
-    def paginated_crawl(self, endpoint, page_size=100, max_pages=None):
+    def _fetch(self, endpoint, url=None, params=None):
         """
-        分页爬取数据
+        发送GET请求并返回原始响应（分页引擎需要读取响应头）
 
         参数:
             endpoint: API端点
-            page_size: 每页大小
-            max_pages: 最大页数
+            url: 完整URL（如Link响应头给出的下一页），为None时使用端点URL
+            params: 查询参数
         """
-        all_data = []
-        page = 1
+        url = url or f"{self.base_url}/{endpoint.lstrip('/')}"
+        response = self.session.get(url, params=params)
+        response.raise_for_status()
+        return response
 
-        while True:
-            if max_pages and page > max_pages:
-                break
+    def iter_paginated(self, endpoint, strategy=None, page_size=100, max_pages=None, concurrency=4, prefetch=1):
+        """
+        分页爬取数据，按页码顺序逐页产出 (页序号, 本页数据)（生成器）
 
-            print(f"正在获取第 {page} 页数据...")
+        参数:
+            endpoint: API端点
+            strategy: 分页策略（见 分页引擎），默认页码分页 ?page=N&limit=page_size
+            page_size: 每页大小（使用默认策略时）
+            max_pages: 最大页数
+            concurrency: 已知数据总数时同时请求的页数（仍受限速器约束）
+            prefetch: 不知道总数时预先请求的页数
+        """
+        strategy = strategy or PagePagination(page_size=page_size)
 
-            params = {
-                'page': page,
-                'limit': page_size
-            }
+        def fetch(url, params):
+            return self._fetch(endpoint, url, params)
 
-            data = self.make_request(endpoint, params=params)
+        yield from paginate(fetch, strategy, max_pages, concurrency, prefetch)
 
-            if not data or not isinstance(data, list) or len(data) == 0:
-                print("没有更多数据")
-                break
+    def paginated_crawl(self, endpoint, page_size=100, max_pages=None, sink=None, strategy=None,
+                        concurrency=4, prefetch=1):
+        """
+        分页爬取数据
+
+        参数:
+            endpoint: API端点
+            page_size: 每页大小
+            max_pages: 最大页数
+            sink: 流式输出对象（见 数据输出.open_sink），传入时每页数据直接写出、不在内存中累积
+            strategy: 分页策略（见 分页引擎），默认页码分页
+            concurrency: 已知数据总数时同时请求的页数
+            prefetch: 不知道总数时预先请求的页数
 
-            all_data.extend(data)
-            print(f"第 {page} 页获取完成，本页 {len(data)} 条，累计 {len(all_data)} 条")
+        返回:
+            未传入sink时返回全部数据列表，否则返回写出的记录数
+        """
+        all_data = []
+        total = 0
 
-            # 如果返回的数据少于请求的页大小，说明是最后一页
-            if len(data) < page_size:
-                break
+        try:
+            for index, data in self.iter_paginated(endpoint, strategy, page_size, max_pages, concurrency, prefetch):
+                if not data:
+                    print("没有更多数据")
+                    break
+
+                if sink is not None:
+                    sink.write_many(data)
+                else:
+                    all_data.extend(data)
+                total += len(data)
+                print(f"第 {index + 1} 页获取完成，本页 {len(data)} 条，累计 {total} 条")
+
+        except (requests.exceptions.RequestException, ValueError) as e:
+            print(f"API请求失败: {e}")
 
-            page += 1
-            time.sleep(1)  # 礼貌延迟
+        return all_data if sink is None else total
 
-        return all_data
+    def _time_windows(self, start, end, window, date_format):
+        """
+        把 [start, end) 切分成多个已经结束的时间窗口
 
-    def incremental_crawl(self, endpoint, date_field='created_at', days=7):
+        窗口起点按 date_format 的精度对齐（如只有日期时对齐到当天0点）；
+        还没有结束的窗口（end之后才结束，如今天）不包含在内，等它结束后再爬取，
+        避免同一窗口被重复爬取、重复写出。
+        """
+        start = datetime.strptime(start.strftime(date_format), date_format)
+        windows = []
+        while start + window <= end:
+            windows.append((start, start + window))
+            start += window
+        return windows
+
+    def incremental_crawl(self, endpoint, date_field='created_at', days=7, sink=None, state_store=None,
+                          window=timedelta(days=1), max_workers=4, date_format='%Y-%m-%d', state_key=None):
         """
         增量爬取数据（按时间范围）
 
+        传入 state_store 时，每个端点的水位线（已完整爬取到的时间点）会持久保存，
+        下次运行只爬取水位线之后的时间窗口。时间范围被切分成多个窗口并发爬取，
+        按时间顺序写出数据并推进水位线；中断后重新运行会从最后提交的水位线继续。
+        尚未结束的窗口（如今天、当前这个小时）不会爬取，等它结束后的下一次运行再爬取，
+        因此每个窗口只会写出一次。
+
         参数:
             endpoint: API端点
             date_field: 日期字段名
-            days: 爬取最近几天的数据
+            days: 最多回溯几天（没有水位线或水位线更早时从这里开始）
+            sink: 流式输出对象（见 数据输出.open_sink），传入时数据直接写出、不在内存中累积
+            state_store: StateStore状态存储（见 状态存储），为None时不记录水位线
+            window: 每个时间窗口的长度
+            max_workers: 同时爬取的窗口数（仍受限速器约束）
+            date_format: start_date / end_date 参数的时间格式
+            state_key: 水位线的键，默认使用端点URL
+
+        返回:
+            未传入sink时返回全部数据列表，否则返回写出的记录数
         """
+        state_key = state_key or f"{self.base_url}/{endpoint.lstrip('/')}"
         end_date = datetime.now()
         start_date = end_date - timedelta(days=days)
 
-        all_data = []
-        current_date = start_date
+        if state_store is not None:
+            watermark = state_store.get('watermark', state_key)
+            if watermark and datetime.fromisoformat(watermark) > start_date:
+                start_date = datetime.fromisoformat(watermark)
+                print(f"从水位线 {watermark} 继续增量爬取")
 
-        while current_date <= end_date:
-            next_date = current_date + timedelta(days=1)
+        windows = self._time_windows(start_date, end_date, window, date_format)
+        if not windows:
+            print("没有已经结束、需要爬取的时间窗口")
+            return [] if sink is None else 0
 
+        def fetch_window(window_range):
+            window_start, window_end = window_range
             params = {
-                'start_date': current_date.strftime('%Y-%m-%d'),
-                'end_date': next_date.strftime('%Y-%m-%d')
+                'start_date': window_start.strftime(date_format),
+                'end_date': window_end.strftime(date_format)
             }
+            data = self._fetch(endpoint, params=params).json()
+            return data if isinstance(data, list) else []
 
-            print(f"正在获取 {current_date.strftime('%Y-%m-%d')} 的数据...")
-
-            data = self.make_request(endpoint, params=params)
-
-            if data and isinstance(data, list):
-                all_data.extend(data)
-                print(f"获取到 {len(data)} 条数据")
-            else:
-                print("没有数据")
-
-            current_date = next_date
-            time.sleep(1)
-
-        return all_data
+        all_data = []
+        total = 0
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(fetch_window, window_range) for window_range in windows]
+
+            # 按时间顺序处理结果，只有之前的窗口都成功时才推进水位线
+            for (window_start, window_end), future in zip(windows, futures):
+                label = window_start.strftime(date_format)
+                try:
+                    data = future.result()
+                except (requests.exceptions.RequestException, ValueError) as e:
+                    print(f"获取 {label} 的数据失败: {e}，水位线停在 {label}，下次运行从这里继续")
+                    for pending in futures:
+                        pending.cancel()
+                    break
+
+                if data:
+                    if sink is not None:
+                        sink.write_many(data)
+                    else:
+                        all_data.extend(data)
+                    total += len(data)
+                    print(f"{label} 获取到 {len(data)} 条数据")
+                else:
+                    print(f"{label} 没有数据")
+
+                # 数据落盘后再提交水位线
+                if state_store is not None:
+                    if sink is not None:
+                        sink.flush()
+                    state_store.set('watermark', state_key, window_end.isoformat())
+
+        return all_data if sink is None else total
 
 
 # 使用示例
@@ -169,5 +275,32 @@ if __name__ == "__main__":
     # 分页爬取数据
     # data = crawler.paginated_crawl('/v1/data', page_size=50, max_pages=10)
 
+    # 响应带有总数时并发请求所有页
+    # data = crawler.paginated_crawl('/v1/data', strategy=PagePagination(page_size=50, items_key='data', total_key='total'))
+
+    # 游标分页 / Link响应头分页
+    # from 分页引擎 import CursorPagination, LinkHeaderPagination
+    # data = crawler.paginated_crawl('/v1/feed', strategy=CursorPagination(next_key='paging.next_cursor'))
+    # data = crawler.paginated_crawl('/v1/repos', strategy=LinkHeaderPagination(page_size=100))
+
+    # 分页爬取并边爬边写入文件（.jsonl / .csv / .parquet）
+    # with open_sink('data.jsonl', flush_size=500) as sink:
+    #     crawler.paginated_crawl('/v1/data', page_size=50, sink=sink)
+
     # 增量爬取数据
-    # data = crawler.incremental_crawl('/v1/records', days=30)
\ No newline at end of file
+    # data = crawler.incremental_crawl('/v1/records', days=30)
+
+    # 每小时运行一次：只爬取上次水位线之后的数据，按小时切分窗口并发爬取
+    # from 状态存储 import StateStore
+    # from 数据输出 import open_sink
+    # with StateStore('crawl_state.db') as store, open_sink('records.jsonl') as sink:
+    #     crawler.incremental_crawl('/v1/records', days=30, sink=sink, state_store=store,
+    #                               window=timedelta(hours=1), date_format='%Y-%m-%dT%H:00:00')
+    # OAuth2认证：令牌缓存在磁盘上，多个爬虫进程共用，快过期时提前刷新
+    # oauth_crawler = APICrawlerWithAuth(
+    #     base_url='https://api.example.com',
+    #     auth_type='oauth2',
+    #     credentials={'token_url': 'https://auth.example.com/oauth/token',
+    #                  'client_id': 'your_client_id', 'client_secret': 'your_client_secret'}
+    # )
+    # data = oauth_crawler.paginated_crawl('/v1/data', page_size=100, concurrency=8)
@@ -0,0 +1,285 @@
+import os
+import csv
+import json
+
+
+class _BufferedSink:
+    """
+    流式输出基类 - 记录先进入缓冲区，攒够 flush_size 条后批量写入磁盘
+
+    每次落盘后都会 fsync，程序中途崩溃最多丢失一个缓冲区的数据。
+    支持 with 语句，退出时（包括异常退出）自动写出剩余数据并关闭文件。
+    """
+
+    def __init__(self, path, flush_size=100):
+        self.path = path
+        self.flush_size = flush_size
+        self.buffer = []
+        self.count = 0  # 已接收的记录数
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def write(self, record):
+        """
+        写入一条记录
+
+        参数:
+            record: 字典形式的记录，其他类型会包装成 {'value': record}
+        """
+        if not isinstance(record, dict):
+            record = {'value': record}
+        self.buffer.append(record)
+        self.count += 1
+        if len(self.buffer) >= self.flush_size:
+            self.flush()
+
+    def write_many(self, records):
+        """
+        写入多条记录
+
+        参数:
+            records: 记录的可迭代对象
+        """
+        for record in records:
+            self.write(record)
+
+    def flush(self):
+        """把缓冲区中的记录写入磁盘"""
+        if self.buffer:
+            self._write_batch(self.buffer)
+            self.buffer = []
+
+    def _write_batch(self, records):
+        raise NotImplementedError
+
+    def close(self):
+        """写出剩余数据并关闭文件"""
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def _sync(f):
+    """把文件内容刷到磁盘"""
+    f.flush()
+    os.fsync(f.fileno())
+
+
+class JsonlSink(_BufferedSink):
+    """JSON Lines输出 - 每行一条JSON记录，追加写入，中断后的文件依然可读"""
+
+    def __init__(self, path, flush_size=100, append=True):
+        """
+        初始化
+
+        参数:
+            path: 输出文件路径
+            flush_size: 攒够多少条记录写一次磁盘
+            append: 是否追加到已有文件（续跑时使用），False时覆盖
+        """
+        super().__init__(path, flush_size)
+        self.file = open(path, 'a' if append else 'w', encoding='utf-8')
+
+    def _write_batch(self, records):
+        lines = [json.dumps(record, ensure_ascii=False, default=str) + '\n' for record in records]
+        self.file.writelines(lines)
+        _sync(self.file)
+
+    def close(self):
+        if not self.file.closed:
+            super().close()
+            self.file.close()
+
+
+class CsvSink(_BufferedSink):
+    """
+    CSV输出 - 流式写入
+
+    没有指定字段名时，用第一批记录中出现的字段作为表头；
+    之后出现的新字段会被忽略（第一次出现时打印提示）。
+    """
+
+    def __init__(self, path, fieldnames=None, flush_size=100, append=True, encoding='utf-8'):
+        """
+        初始化
+
+        参数:
+            path: 输出文件路径
+            fieldnames: 字段名列表，为None时自动推断
+            flush_size: 攒够多少条记录写一次磁盘
+            append: 是否追加到已有文件（续跑时沿用已有表头），False时覆盖
+            encoding: 文件编码
+        """
+        super().__init__(path, flush_size)
+        self.fieldnames = list(fieldnames) if fieldnames else None
+        self.writer = None
+        self._warned = set()
+
+        has_header = append and os.path.exists(path) and os.path.getsize(path) > 0
+        if has_header and not self.fieldnames:
+            with open(path, 'r', newline='', encoding=encoding) as f:
+                self.fieldnames = next(csv.reader(f))
+
+        self.file = open(path, 'a' if append else 'w', newline='', encoding=encoding)
+        if self.fieldnames:
+            self._create_writer(write_header=not has_header)
+
+    def _create_writer(self, write_header):
+        self.writer = csv.DictWriter(self.file, fieldnames=self.fieldnames, extrasaction='ignore')
+        if write_header:
+            self.writer.writeheader()
+
+    def _write_batch(self, records):
+        if self.writer is None:
+            # 按出现顺序收集第一批记录的字段名
+            self.fieldnames = list(dict.fromkeys(key for record in records for key in record))
+            self._create_writer(write_header=True)
+
+        for record in records:
+            extra = record.keys() - set(self.fieldnames) - self._warned
+            if extra:
+                print(f"CSV表头中没有这些字段，已忽略: {', '.join(map(str, extra))}")
+                self._warned.update(extra)
+            self.writer.writerow(record)
+        _sync(self.file)
+
+    def close(self):
+        if not self.file.closed:
+            super().close()
+            self.file.close()
+
+
+class ParquetSink(_BufferedSink):
+    """
+    Parquet输出 - 每次落盘写入一个行组（row group），按行数滚动成多个文件
+
+    Parquet文件的元数据（footer）在关闭文件时才写入，没有关闭的文件无法读取。
+    因此正在写的文件使用隐藏的临时文件名（以 . 开头，pyarrow/pandas 读取目录时会忽略），
+    每写满 file_rows 条记录关闭一次并改名为 <文件名>.parquet、<文件名>.1.parquet、<文件名>.2.parquet ……
+    进程被杀死时最多丢失正在写的那个文件（不超过 file_rows 条），已改名的文件都是完整可读的；
+    需要逐条续跑的场景仍建议使用 JSONL/CSV。
+    读取时用 pandas.read_parquet 读取整个目录即可。
+
+    没有指定 schema 时用第一批记录推断，所有文件共用这个 schema；
+    之后才出现的新字段会被忽略（和 CsvSink 一样，第一次出现时打印提示），需要时请显式传入 schema。
+    """
+
+    def __init__(self, path, flush_size=10000, append=True, schema=None, compression='snappy', file_rows=100000):
+        """
+        初始化
+
+        参数:
+            path: 输出文件路径
+            flush_size: 每个行组的记录数
+            append: 目标文件已存在时是否保留它并写入新文件，
+                    False时删除之前运行留下的 <文件名>.parquet 和 <文件名>.N.parquet
+            schema: pyarrow.Schema，为None时自动推断
+            compression: 压缩算法
+            file_rows: 每个文件的最大记录数，写满后关闭并开始下一个文件
+        """
+        import pyarrow  # Parquet输出才需要pyarrow
+        import pyarrow.parquet
+
+        self._pa = pyarrow
+        self._pq = pyarrow.parquet
+
+        super().__init__(path, flush_size)
+        self.schema = schema
+        self.compression = compression
+        self.file_rows = file_rows
+        self.append = append
+        self.paths = []  # 已完成的文件
+        self.writer = None
+        self._rows = 0
+        self._warned = set()
+        directory, name = os.path.split(path)
+        self._tmp_path = os.path.join(directory, f'.{name}.inprogress')
+        if not append:
+            self._remove_old_files()
+
+    def _remove_old_files(self):
+        """删除之前运行写出的文件，避免读取目录时和这次的输出混在一起"""
+        directory = os.path.dirname(self.path) or '.'
+        stem, ext = os.path.splitext(os.path.basename(self.path))
+        for name in os.listdir(directory):
+            index = name[len(stem) + 1:-len(ext)] if name.startswith(stem + '.') and name.endswith(ext) else ''
+            if name == stem + ext or index.isdigit():
+                os.remove(os.path.join(directory, name))
+
+    def _next_path(self):
+        """下一个完成文件的路径：追加模式下跳过已存在的文件"""
+        stem, ext = os.path.splitext(self.path)
+        index = len(self.paths)
+        while True:
+            path = self.path if index == 0 else f'{stem}.{index}{ext}'
+            if not (self.append and os.path.exists(path)):
+                return path
+            index += 1
+
+    def _finish_file(self):
+        """关闭正在写的文件并改为正式文件名"""
+        if self.writer is None:
+            return
+        self.writer.close()
+        self.writer = None
+        path = self._next_path()
+        os.replace(self._tmp_path, path)
+        self.paths.append(path)
+        self._rows = 0
+
+    def _write_batch(self, records):
+        if self.schema is not None:
+            extra = {key for record in records for key in record} - set(self.schema.names) - self._warned
+            if extra:
+                print(f"Parquet schema中没有这些字段，已忽略: {', '.join(map(str, extra))}")
+                self._warned.update(extra)
+        table = self._pa.Table.from_pylist(records, schema=self.schema)
+        if self.writer is None:
+            self.schema = table.schema
+            self.writer = self._pq.ParquetWriter(self._tmp_path, self.schema, compression=self.compression)
+        self.writer.write_table(table)
+        self._rows += len(records)
+        if self._rows >= self.file_rows:
+            self._finish_file()
+
+    def close(self):
+        super().close()
+        self._finish_file()
+
+
+SINKS = {
+    '.jsonl': JsonlSink,
+    '.csv': CsvSink,
+    '.parquet': ParquetSink,
+}
+
+
+def open_sink(path, **kwargs):
+    """
+    按文件扩展名创建输出对象（.jsonl / .csv / .parquet）
+
+    参数:
+        path: 输出文件路径
+        kwargs: 传给对应输出类的参数，如 flush_size、append
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.json':
+        # .json 文件通常被当作一个JSON数组读取，逐行写入的记录请使用 .jsonl
+        raise ValueError("流式输出不支持 .json（JSON数组），请使用 .jsonl")
+    if ext not in SINKS:
+        raise ValueError(f"不支持的输出格式: {ext}，可选: {', '.join(SINKS)}")
+    return SINKS[ext](path, **kwargs)
+
+
+# 使用示例
+if __name__ == "__main__":
+    # 边爬边写，崩溃时已落盘的数据不会丢失
+    # with open_sink('output/records.jsonl', flush_size=500) as sink:
+    #     for record in crawl():
+    #         sink.write(record)
+    pass
@@ -0,0 +1,357 @@
+"""
+浏览器池 - 复用常驻的无头Chrome，避免每个页面都启动一次浏览器
+
+    池中最多 size 个浏览器，每个浏览器打开 tabs 个标签页；
+    lease() 借出一个浏览器独占使用，归还时回到空白页，并通过CDP清理所有来源的Cookie、
+    本地存储、IndexedDB、缓存和 Service Worker；
+    归还时做健康检查：浏览器崩溃、标签页丢失、JS堆内存过大或打开页面数达到上限时关闭并重建；
+    render() 把一批URL分给池中的浏览器并行渲染，每个浏览器在多个标签页中交替加载，
+    一个标签页在提取数据时，其他标签页的页面已经在后台加载。
+"""
+import time
+import queue
+import threading
+import contextlib
+from selenium import webdriver
+from selenium.common.exceptions import WebDriverException, TimeoutException
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.support.ui import WebDriverWait
+from 网络捕获 import enable_performance_log, block_resources, drain_log
+
+# 导航前给旧文档打上标记，新文档加载完成且没有标记时才算加载完成
+MARK_STALE_JS = "document.documentElement && (document.documentElement.dataset.poolStale = '1');"
+PAGE_READY_JS = ("return document.readyState === 'complete' && "
+                 "!(document.documentElement && document.documentElement.dataset.poolStale);")
+JS_HEAP_JS = "return (performance.memory && performance.memory.usedJSHeapSize) || 0;"
+
+
+def default_chrome_options(headless=True, capture_network=False):
+    """
+    爬虫使用的Chrome选项
+
+    参数:
+        headless: 是否使用无头模式
+        capture_network: 是否开启性能日志（用于捕获XHR响应）
+    """
+    chrome_options = Options()
+    if headless:
+        chrome_options.add_argument('--headless')  # 无头模式，不显示浏览器窗口
+    chrome_options.add_argument('--no-sandbox')
+    chrome_options.add_argument('--disable-dev-shm-usage')
+    if capture_network:
+        enable_performance_log(chrome_options)
+    return chrome_options
+
+
+class Browser:
+    """池中的一个浏览器及其标签页"""
+
+    def __init__(self, driver, tabs):
+        self.driver = driver
+        self.handles = [driver.current_window_handle]
+        for _ in range(tabs - 1):
+            driver.switch_to.new_window('tab')
+            self.handles.append(driver.current_window_handle)
+        driver.switch_to.window(self.handles[0])
+        self.pages = 0  # 已打开的页面数
+        self.broken = False
+
+    def quit(self):
+        try:
+            self.driver.quit()
+        except Exception:
+            pass
+
+
+class BrowserPool:
+    """
+    无头浏览器池（线程安全）
+    """
+
+    def __init__(self, size=2, tabs=2, max_pages=200, max_heap_mb=512, page_load_timeout=30,
+                 headless=True, driver_factory=None, block_types=(), block_patterns=(), capture_network=False):
+        """
+        初始化（浏览器在第一次使用时才启动）
+
+        参数:
+            size: 浏览器数量
+            tabs: 每个浏览器的标签页数
+            max_pages: 每个浏览器打开多少个页面后重建（防止内存泄漏累积）
+            max_heap_mb: 标签页JS堆内存超过多少MB时重建浏览器
+            page_load_timeout: 页面加载超时（秒）
+            headless: 是否使用无头模式
+            driver_factory: 创建WebDriver的函数，默认启动本机Chrome
+            block_types: 所有标签页屏蔽的资源类型，如 ('image', 'font', 'media')，见 网络捕获
+            block_patterns: 所有标签页额外屏蔽的URL模式
+            capture_network: 开启性能日志，用 网络捕获.capture_json 获取XHR返回的JSON；
+                             性能日志不区分标签页，开启后每个浏览器只使用一个标签页
+        """
+        if capture_network and tabs > 1:
+            print("捕获网络响应时每个浏览器只使用一个标签页")
+            tabs = 1
+
+        self.size = size
+        self.tabs = tabs
+        self.max_pages = max_pages
+        self.max_heap = max_heap_mb * 1024 * 1024
+        self.page_load_timeout = page_load_timeout
+        self.block_types = block_types
+        self.block_patterns = block_patterns
+        self.capture_network = capture_network
+        self.driver_factory = driver_factory or (
+            lambda: webdriver.Chrome(options=default_chrome_options(headless, capture_network))
+        )
+
+        self._idle = queue.LifoQueue()  # 后进先出：优先使用刚归还的热浏览器
+        self._lock = threading.Lock()
+        self._created = 0
+        self._closed = False
+
+    def _new_browser(self):
+        driver = self.driver_factory()
+        driver.set_page_load_timeout(self.page_load_timeout)
+        browser = Browser(driver, self.tabs)
+        if self.block_types or self.block_patterns:
+            # 屏蔽设置按标签页生效，浏览器存活期间一直保留
+            for handle in browser.handles:
+                driver.switch_to.window(handle)
+                block_resources(driver, self.block_types, self.block_patterns)
+            driver.switch_to.window(browser.handles[0])
+        return browser
+
+    def _acquire(self, timeout=None):
+        """取一个空闲浏览器；没有空闲且未达到上限时启动新浏览器，否则等待归还"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                if self._closed:
+                    raise RuntimeError("浏览器池已关闭")
+                try:
+                    return self._idle.get_nowait()
+                except queue.Empty:
+                    pass
+                create = self._created < self.size
+                if create:
+                    self._created += 1
+
+            if create:
+                try:
+                    print(f"启动浏览器（{self._created}/{self.size}）")
+                    return self._new_browser()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+
+            # 定期醒来重新检查：被回收的浏览器不会放回空闲队列，但会空出启动名额
+            wait = 0.5 if deadline is None else min(0.5, deadline - time.monotonic())
+            if wait <= 0:
+                raise TimeoutError("没有空闲的浏览器")
+            try:
+                return self._idle.get(timeout=wait)
+            except queue.Empty:
+                continue
+
+    def _healthy(self, browser):
+        """健康检查：浏览器能响应、标签页都在、内存没有超限、页面数没有超限"""
+        if browser.broken or browser.pages >= self.max_pages:
+            return False
+        try:
+            if set(browser.driver.window_handles) != set(browser.handles):
+                return False
+            for handle in browser.handles:
+                browser.driver.switch_to.window(handle)
+                if browser.driver.execute_script(JS_HEAP_JS) > self.max_heap:
+                    return False
+            return True
+        except WebDriverException:
+            return False
+
+    def _reset(self, browser):
+        """清理浏览器状态，下一次借出时和新浏览器一样"""
+        driver = browser.driver
+        for handle in browser.handles:
+            driver.switch_to.window(handle)
+            driver.get('about:blank')
+        driver.switch_to.window(browser.handles[0])
+        # 借出期间访问过的所有来源（不只是标签页最后停留的来源）的存储都要清掉
+        driver.execute_cdp_cmd('Storage.clearDataForOrigin', {'origin': '*', 'storageTypes': 'all'})
+        driver.execute_cdp_cmd('Network.clearBrowserCache', {})
+        driver.execute_cdp_cmd('Network.clearBrowserCookies', {})
+        if self.capture_network:
+            drain_log(driver)
+
+    def _release(self, browser):
+        if not self._closed and self._healthy(browser):
+            try:
+                self._reset(browser)
+                self._idle.put(browser)
+                return
+            except Exception:
+                pass
+
+        # 崩溃、泄漏或达到页面上限：关闭，下次借用时重建
+        browser.quit()
+        with self._lock:
+            self._created -= 1
+        if not self._closed:
+            print(f"浏览器已回收（打开过 {browser.pages} 个页面）")
+
+    @contextlib.contextmanager
+    def lease(self, timeout=None):
+        """
+        借出一个浏览器（with语句），退出时自动归还
+
+        参数:
+            timeout: 没有空闲浏览器时最多等待的秒数，为None时一直等待
+
+        示例:
+            with pool.lease() as driver:
+                driver.get(url)
+        """
+        browser = self._acquire(timeout)
+        try:
+            yield browser.driver
+        except WebDriverException:
+            browser.broken = True
+            raise
+        finally:
+            browser.pages += 1
+            self._release(browser)
+
+    def _fail_all(self, browser, in_flight, results):
+        """浏览器出问题：本浏览器上未完成的URL记为失败，浏览器归还时会被回收"""
+        browser.broken = True
+        for url in in_flight.values():
+            print(f"渲染失败: {url}")
+            results.put((url, None))
+        in_flight.clear()
+
+    def _render_with(self, browser, urls, extract, results, in_flight, stop):
+        """
+        用一个浏览器的多个标签页交替渲染URL
+
+        每个空闲标签页先发起导航（不等待加载完成），再依次等待各标签页加载完成并提取数据。
+        in_flight 记录 标签页 -> 已发起导航、还没有产出结果的URL；stop 被设置后不再发起新的导航。
+        """
+        driver = browser.driver
+        while True:
+            for handle in browser.handles:
+                if handle in in_flight:
+                    continue
+                if stop.is_set() or browser.pages + len(in_flight) >= self.max_pages:
+                    break  # 已停止或达到页面上限：处理完在途页面后归还，由池重建浏览器
+                try:
+                    url = urls.get_nowait()
+                except queue.Empty:
+                    break
+                in_flight[handle] = url
+                try:
+                    driver.switch_to.window(handle)
+                    if self.capture_network:
+                        drain_log(driver)
+                    driver.execute_script(MARK_STALE_JS + "window.location.href = arguments[0];", url)
+                except WebDriverException:
+                    self._fail_all(browser, in_flight, results)
+                    return
+
+            if not in_flight:
+                return
+
+            for handle, url in list(in_flight.items()):
+                try:
+                    driver.switch_to.window(handle)
+                    WebDriverWait(driver, self.page_load_timeout).until(
+                        lambda d: d.execute_script(PAGE_READY_JS)
+                    )
+                    results.put((url, extract(driver, url)))
+                except TimeoutException:
+                    print(f"页面加载超时: {url}")
+                    results.put((url, None))
+                except WebDriverException:
+                    # 浏览器崩溃或标签页已关闭
+                    self._fail_all(browser, in_flight, results)
+                    return
+                except Exception as e:
+                    print(f"提取数据失败: {url}: {e}")
+                    results.put((url, None))
+                browser.pages += 1
+                del in_flight[handle]
+
+    def render(self, urls, extract):
+        """
+        用池中的浏览器并行渲染一批URL，按完成顺序产出 (URL, 提取结果)（生成器）
+
+        提前结束迭代（break 或关闭生成器）时，工作线程不再发起新的导航，处理完在途页面后归还浏览器。
+
+        参数:
+            urls: URL列表
+            extract: 提取函数 extract(driver, url)，调用时driver已切换到该页面的标签页；
+                     出错时该URL的结果为None
+        """
+        pending = queue.Queue()
+        urls = list(urls)
+        for url in urls:
+            pending.put(url)
+        results = queue.Queue()
+        stop = threading.Event()
+
+        def worker():
+            while not stop.is_set() and not pending.empty():
+                try:
+                    browser = self._acquire()
+                except Exception as e:
+                    print(f"启动浏览器失败: {e}")
+                    return
+                in_flight = {}
+                try:
+                    self._render_with(browser, pending, extract, results, in_flight, stop)
+                except Exception as e:
+                    # 意外错误：在途URL记为失败，浏览器归还时被回收，线程继续用新浏览器处理剩余URL
+                    print(f"渲染出错: {e}")
+                    self._fail_all(browser, in_flight, results)
+                finally:
+                    self._release(browser)
+
+        threads = [threading.Thread(target=worker, daemon=True) for _ in range(min(self.size, len(urls)))]
+        for thread in threads:
+            thread.start()
+
+        try:
+            for _ in range(len(urls)):
+                while True:
+                    try:
+                        yield results.get(timeout=1)
+                        break
+                    except queue.Empty:
+                        if not any(thread.is_alive() for thread in threads) and results.empty():
+                            return  # 所有浏览器都启动失败
+        finally:
+            stop.set()
+
+    def close(self):
+        """关闭所有空闲浏览器；借出中的浏览器归还时关闭"""
+        with self._lock:
+            self._closed = True
+        while True:
+            try:
+                browser = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            browser.quit()
+            with self._lock:
+                self._created -= 1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+# 使用示例
+if __name__ == "__main__":
+    with BrowserPool(size=2, tabs=3) as pool:
+        urls = ['https://httpbin.org/html'] * 6
+        for url, title in pool.render(urls, lambda driver, url: driver.title):
+            print(url, title)
@@ -3,43 +3,238 @@
            parsel >>> pip install parsel            <第三方模块>
            prettytable >>> pip install prettytable  <第三方模块>
 
-
+章节并发下载（按主机限速），每章先保存为单独的分片文件，
+下载进度记录在清单（manifest.db）中，中断后重新运行只下载未完成的章节；
+全部完成后按章节顺序逐章拼接成一个txt文件，可选生成EPUB。
 """
-import requests  # 第三方的模块
 import parsel  # 第三方的模块
 import os  # 内置模块 文件或文件夹
+import re
+import html
+import shutil
+import zipfile
+import concurrent.futures
+from HTTP客户端 import create_session
+from 限速器 import HostRateLimiter
+from 状态存储 import StateStore
+
+BASE_URL = 'https://www.bqg70.com'
+
+
+def safe_filename(name):
+    """去掉文件名中不允许的字符"""
+    return re.sub(r'[\\/:*?"<>|\r\n]', '_', name).strip() or 'untitled'
+
+
+def get_chapter_list(session, book_id):
+    """
+    获取书名和章节目录
+
+    参数:
+        session: 请求会话
+        book_id: 书名ID
+
+    返回:
+        (书名, [(章节标题, 章节URL), ...])
+    """
+    link = f'{BASE_URL}/book/{book_id}/'
+    response = session.get(url=link)
+    response.raise_for_status()
+    selector_2 = parsel.Selector(response.text)
+
+    book_title = (selector_2.css('meta[property="og:novel:book_name"]::attr(content)').get()
+                  or selector_2.css('h1::text').get()
+                  or str(book_id))
+
+    chapters = []
+    for div in selector_2.css('.listmain dd'):
+        title = div.css('a::text').get()
+        href = div.css('a::attr(href)').get()
+        if title and href and href.startswith('/'):
+            chapters.append((title.strip(), BASE_URL + href))
+
+    # 目录开头是"最新章节"，和正文目录重复；同一章节保留最后一次出现的位置
+    last_index = {url: i for i, (_, url) in enumerate(chapters)}
+    chapters = [chapter for i, chapter in enumerate(chapters) if last_index[chapter[1]] == i]
+    return book_title.strip(), chapters
+
+
+def fetch_chapter(session, url):
+    """
+    下载一章正文
+
+    参数:
+        session: 请求会话
+        url: 章节URL
+
+    返回:
+        正文；页面中没有正文（如反爬验证页）时抛出 ValueError，该章节留在待下载中，下次重新下载
+    """
+    response = session.get(url=url)
+    response.raise_for_status()
+    selector = parsel.Selector(response.text)
+    # getall 返回的是一个列表 []
+    book = selector.css('#chaptercontent::text').getall()
+    text = '\n'.join(line.strip() for line in book if line.strip())
+    if not text:
+        raise ValueError(f"章节正文为空: {url}")
+    return text
+
+
+def _part_path(parts_dir, index):
+    return os.path.join(parts_dir, f'{index:05d}.txt')
+
+
+def _save_part(parts_dir, index, title, text):
+    """保存一章分片：先写临时文件再改名，中断时不会留下写了一半的分片"""
+    path = _part_path(parts_dir, index)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, mode='w', encoding='utf-8') as f:
+        f.write(title + '\n\n' + text + '\n\n')
+    os.replace(tmp_path, path)
+
+
+def assemble_txt(chapters, parts_dir, output_file):
+    """
+    按章节顺序把分片拼接成一个txt文件（逐个分片流式复制，不把整本书读入内存）
+
+    参数:
+        chapters: 章节目录
+        parts_dir: 分片目录
+        output_file: 输出文件
+    """
+    with open(output_file, mode='w', encoding='utf-8') as out:
+        for index in range(len(chapters)):
+            with open(_part_path(parts_dir, index), mode='r', encoding='utf-8') as part:
+                shutil.copyfileobj(part, out)
+    print(f"已生成: {output_file}")
+
+
+def build_epub(book_title, chapters, parts_dir, output_file):
+    """
+    按章节顺序生成EPUB（每次只读取一章）
+
+    参数:
+        book_title: 书名
+        chapters: 章节目录
+        parts_dir: 分片目录
+        output_file: 输出文件
+    """
+    title = html.escape(book_title)
+    with zipfile.ZipFile(output_file, 'w', zipfile.ZIP_DEFLATED) as epub:
+        # mimetype 必须是第一个文件且不压缩
+        epub.writestr('mimetype', 'application/epub+zip', compress_type=zipfile.ZIP_STORED)
+        epub.writestr('META-INF/container.xml',
+                      '<?xml version="1.0" encoding="utf-8"?>\n'
+                      '<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">'
+                      '<rootfiles><rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/>'
+                      '</rootfiles></container>')
+
+        manifest, spine, nav_points = [], [], []
+        for index, (chapter_title, _) in enumerate(chapters):
+            with open(_part_path(parts_dir, index), mode='r', encoding='utf-8') as part:
+                lines = part.read().split('\n')[2:]  # 分片前两行是标题和空行
+            body = ''.join(f'<p>{html.escape(line)}</p>' for line in lines if line.strip())
+            name = f'chapter{index:05d}.xhtml'
+            epub.writestr(f'OEBPS/{name}',
+                          '<?xml version="1.0" encoding="utf-8"?>\n'
+                          '<html xmlns="http://www.w3.org/1999/xhtml"><head>'
+                          f'<title>{html.escape(chapter_title)}</title></head>'
+                          f'<body><h2>{html.escape(chapter_title)}</h2>{body}</body></html>')
+
+            manifest.append(f'<item id="c{index}" href="{name}" media-type="application/xhtml+xml"/>')
+            spine.append(f'<itemref idref="c{index}"/>')
+            nav_points.append(f'<navPoint id="n{index}" playOrder="{index + 1}">'
+                              f'<navLabel><text>{html.escape(chapter_title)}</text></navLabel>'
+                              f'<content src="{name}"/></navPoint>')
+
+        epub.writestr('OEBPS/content.opf',
+                      '<?xml version="1.0" encoding="utf-8"?>\n'
+                      '<package xmlns="http://www.idpf.org/2007/opf" version="2.0" unique-identifier="bookid">'
+                      '<metadata xmlns:dc="http://purl.org/dc/elements/1.1/">'
+                      f'<dc:title>{title}</dc:title><dc:language>zh</dc:language>'
+                      f'<dc:identifier id="bookid">{title}</dc:identifier></metadata>'
+                      '<manifest><item id="ncx" href="toc.ncx" media-type="application/x-dtbncx+xml"/>'
+                      f'{"".join(manifest)}</manifest>'
+                      f'<spine toc="ncx">{"".join(spine)}</spine></package>')
+        epub.writestr('OEBPS/toc.ncx',
+                      '<?xml version="1.0" encoding="utf-8"?>\n'
+                      '<ncx xmlns="http://www.daisy.org/z3986/2005/ncx/" version="2005-1">'
+                      f'<head><meta name="dtb:uid" content="{title}"/></head>'
+                      f'<docTitle><text>{title}</text></docTitle>'
+                      f'<navMap>{"".join(nav_points)}</navMap></ncx>')
+    print(f"已生成: {output_file}")
+
+
+def download_novel(book_id, output_dir='小说', max_workers=8, requests_per_second=5.0, epub=False):
+    """
+    下载整本小说
+
+    参数:
+        book_id: 书名ID
+        output_dir: 保存目录
+        max_workers: 同时下载的章节数
+        requests_per_second: 对小说站每秒允许的请求数
+        epub: 是否同时生成EPUB
+
+    返回:
+        生成的txt文件路径，有章节下载失败时返回None（重新运行会继续下载失败的章节）
+    """
+    session = create_session(
+        concurrency=max_workers,
+        rate_limiter=HostRateLimiter(rate=requests_per_second, burst=max_workers)
+    )
+
+    book_title, chapters = get_chapter_list(session, book_id)
+    print(f"《{book_title}》共 {len(chapters)} 章")
+
+    book_dir = os.path.join(output_dir, safe_filename(book_title))
+    parts_dir = os.path.join(book_dir, 'parts')
+    os.makedirs(parts_dir, exist_ok=True)
+
+    with StateStore(os.path.join(book_dir, 'manifest.db')) as manifest:
+        # 清单按章节URL记录；目录更新导致章节序号变化时，该章节会重新下载
+        done = dict(manifest.items('chapters'))
+        pending = []
+        for index, (title, url) in enumerate(chapters):
+            record = done.get(url)
+            if record and record['index'] == index and os.path.exists(_part_path(parts_dir, index)):
+                continue
+            pending.append((index, title, url))
+        print(f"已完成 {len(chapters) - len(pending)} 章，待下载 {len(pending)} 章")
+
+        def download(chapter):
+            index, title, url = chapter
+            text = fetch_chapter(session, url)
+            _save_part(parts_dir, index, title, text)
+            return chapter, len(text)
+
+        failed = 0
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(download, chapter) for chapter in pending]
+            for future in concurrent.futures.as_completed(futures):
+                try:
+                    (index, title, url), size = future.result()
+                    manifest.set('chapters', url, {'index': index, 'title': title, 'size': size})
+                    print('正在下载章节:  ', title)
+                except Exception as e:
+                    failed += 1
+                    print(f"下载章节失败: {e}")
+
+    if failed:
+        print(f"有 {failed} 章下载失败，请重新运行继续下载")
+        return None
+
+    output_file = os.path.join(book_dir, safe_filename(book_title) + '.txt')
+    assemble_txt(chapters, parts_dir, output_file)
+    if epub:
+        build_epub(book_title, chapters, parts_dir, os.path.join(book_dir, safe_filename(book_title) + '.epub'))
+    return output_file
+
+
+if __name__ == "__main__":
+    rid = input('输入书名ID：')
+    download_novel(rid)
 
-filename = '小说\\'
-if not os.path.exists(filename):
-    os.mkdir(filename)
-
-headers = {
-    'user-agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/106.0.0.0 Safari/537.36',
-}
-
-    
-
-rid = input('输入书名ID：')
-link = f'https://www.bqg70.com/book/{rid}/'
-
-html_data = requests.get(url=link, headers=headers).text
-# print(html_data)
-selector_2 = parsel.Selector(html_data)
-divs = selector_2.css('.listmain dd')
-for div in divs:
-    title = div.css('a::text').get()
-    href = div.css('a::attr(href)').get()
-    url = 'https://www.bqg70.com' + href
-
-    try:
-        response = requests.get(url=url, headers=headers)
-        selector = parsel.Selector(response.text)
-        # getall 返回的是一个列表 []
-        book = selector.css('#chaptercontent::text').getall()
-        book = '\n'.join(book)
-        # 数据保存
-        with open(filename + title + '.txt', mode='a', encoding='utf-8') as f:
-            f.write(book)
-            print('正在下载章节:  ', title)
-    except Exception as e:
-        print(e)
+    # 同时生成EPUB，提高并发
+    # download_novel(rid, max_workers=16, requests_per_second=10, epub=True)
@@ -0,0 +1,119 @@
+import json
+import sqlite3
+import threading
+import contextlib
+
+
+class StateStore:
+    """
+    爬虫状态存储 - 基于SQLite的键值存储，用于保存水位线、断点和进度
+
+    数据按命名空间（namespace）分组，值以JSON保存。
+    每次写入都是一个独立事务；需要同时更新多个键时使用 transaction()，
+    要么全部生效，要么全部不生效，程序中断后可以从最后一次提交的状态继续。
+    多个线程可以共享同一个实例；多个进程可以同时打开同一个数据库文件。
+    """
+
+    def __init__(self, path='crawl_state.db'):
+        """
+        初始化
+
+        参数:
+            path: SQLite数据库文件路径
+        """
+        self.path = path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS state ('
+            'namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT, '
+            'updated_at TEXT DEFAULT CURRENT_TIMESTAMP, PRIMARY KEY (namespace, key))'
+        )
+        self._in_transaction = False
+
+    def get(self, namespace, key, default=None):
+        """
+        读取一个值
+
+        参数:
+            namespace: 命名空间，如 'watermark'
+            key: 键
+            default: 不存在时返回的默认值
+        """
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT value FROM state WHERE namespace = ? AND key = ?', (namespace, str(key))
+            ).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set(self, namespace, key, value):
+        """
+        写入一个值（不在 transaction() 中时立即提交）
+
+        参数:
+            namespace: 命名空间
+            key: 键
+            value: 可JSON序列化的值
+        """
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO state (namespace, key, value, updated_at) '
+                'VALUES (?, ?, ?, CURRENT_TIMESTAMP)',
+                (namespace, str(key), json.dumps(value, ensure_ascii=False, default=str))
+            )
+
+    def delete(self, namespace, key):
+        """删除一个值"""
+        with self._lock:
+            self._conn.execute('DELETE FROM state WHERE namespace = ? AND key = ?', (namespace, str(key)))
+
+    def keys(self, namespace):
+        """命名空间下的所有键"""
+        with self._lock:
+            rows = self._conn.execute('SELECT key FROM state WHERE namespace = ?', (namespace,)).fetchall()
+        return [row[0] for row in rows]
+
+    def items(self, namespace):
+        """命名空间下的所有 (键, 值)"""
+        with self._lock:
+            rows = self._conn.execute('SELECT key, value FROM state WHERE namespace = ?', (namespace,)).fetchall()
+        return [(key, json.loads(value)) for key, value in rows]
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """
+        事务 - with块中的所有写入一起提交，出现异常时全部回滚
+
+        示例:
+            with store.transaction():
+                store.set('watermark', 'orders', '2024-01-02')
+                store.set('progress', 'orders', 123)
+        """
+        with self._lock:
+            if self._in_transaction:
+                # 嵌套事务并入外层事务
+                yield self
+                return
+
+            self._conn.execute('BEGIN IMMEDIATE')
+            self._in_transaction = True
+            try:
+                yield self
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                raise
+            else:
+                self._conn.execute('COMMIT')
+            finally:
+                self._in_transaction = False
+
+    def close(self):
+        """关闭数据库"""
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -1,9 +1,21 @@
-import requests
-from bs4 import BeautifulSoup
 import pandas as pd
 import json
-import time
-import random
+import asyncio
+import itertools
+import concurrent.futures
+from HTTP客户端 import create_session
+from 限速器 import HostRateLimiter
+from HTML解析器 import Selector, get_parser
+
+# 预编译的选择器（根据实际网站结构调整），class包含product/review，不区分大小写
+PRODUCT_CARD = Selector(
+    'div[class*="product" i]',
+    xpath="//div[contains(translate(@class, 'PRODUCT', 'product'), 'product')]"
+)
+REVIEW_ELEMENT = Selector(
+    'div[class*="review" i]',
+    xpath="//div[contains(translate(@class, 'REVIEW', 'review'), 'review')]"
+)
 
 
 class EcommerceCrawler:
@@ -11,20 +23,20 @@ class EcommerceCrawler:
     电商商品数据爬虫 - 爬取商品信息、价格、评论等
     """
 
-    def __init__(self, base_delay=1, max_delay=3):
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
-            'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8'
-        })
-        self.base_delay = base_delay
-        self.max_delay = max_delay
+    def __init__(self, requests_per_second=0.5, burst=1, parser=None):
+        """
+        初始化
 
-    def random_delay(self):
-        """随机延迟，避免被封IP"""
-        delay = random.uniform(self.base_delay, self.max_delay)
-        time.sleep(delay)
+        参数:
+            requests_per_second: 每个主机每秒允许的请求数（按主机限速，避免被封IP）
+            burst: 每个主机允许的突发请求数
+            parser: HTML解析后端 'lxml' / 'bs4-lxml' / 'html.parser'，默认使用可用的最快后端
+        """
+        self.parser = get_parser(parser)
+        self.rate_limiter = HostRateLimiter(rate=requests_per_second, burst=burst)
+        self.session = create_session(headers={
+            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8'
+        }, rate_limiter=self.rate_limiter)
 
     def extract_product_info(self, product_url):
         """
@@ -36,94 +48,177 @@ class EcommerceCrawler:
         try:
             print(f"正在爬取商品: {product_url}")
 
-            response = self.session.get(product_url, timeout=10)
+            response = self.session.get(product_url)
             response.raise_for_status()
             response.encoding = 'utf-8'
 
-            soup = BeautifulSoup(response.text, 'html.parser')
+            root = self.parser.parse(response.text)
 
             product_info = {
                 'url': product_url,
-                'title': self._extract_title(soup),
-                'price': self._extract_price(soup),
-                'original_price': self._extract_original_price(soup),
-                'rating': self._extract_rating(soup),
-                'review_count': self._extract_review_count(soup),
-                'description': self._extract_description(soup),
-                'specifications': self._extract_specifications(soup),
-                'images': self._extract_images(soup),
-                'stock_status': self._extract_stock_status(soup),
+                'title': self._extract_title(root),
+                'price': self._extract_price(root),
+                'original_price': self._extract_original_price(root),
+                'rating': self._extract_rating(root),
+                'review_count': self._extract_review_count(root),
+                'description': self._extract_description(root),
+                'specifications': self._extract_specifications(root),
+                'images': self._extract_images(root),
+                'stock_status': self._extract_stock_status(root),
                 'timestamp': pd.Timestamp.now()
             }
 
-            self.random_delay()
             return product_info
 
         except Exception as e:
             print(f"爬取商品失败: {e}")
             return None
 
-    def extract_products_from_listing(self, listing_url, max_products=20):
+    def _collect_product_links(self, listing_url, max_links):
         """
-        从商品列表页提取多个商品信息
+        从商品列表页收集商品链接（保持页面顺序并去重）
 
         参数:
             listing_url: 商品列表页URL
-            max_products: 最大商品数量
+            max_links: 最多收集的链接数
         """
-        try:
-            print(f"正在爬取商品列表: {listing_url}")
+        print(f"正在爬取商品列表: {listing_url}")
+
+        response = self.session.get(listing_url)
+        response.raise_for_status()
+        response.encoding = 'utf-8'
+
+        parser = self.parser
+        root = parser.parse(response.text)
+
+        # 提取商品链接（根据实际网站结构调整选择器）
+        product_links = []
+
+        # 方法1: 查找商品卡片中的链接
+        product_cards = parser.select(root, PRODUCT_CARD)
+        for card in product_cards[:max_links]:
+            link = parser.select_one(card, 'a[href]')
+            if link is not None:
+                href = parser.attr(link, 'href')
+                if not href.startswith('http'):
+                    href = 'https://example.com' + href  # 根据实际情况调整
+                product_links.append(href)
+
+        # 方法2: 直接查找所有商品链接
+        if not product_links:
+            all_links = parser.select(root, 'a[href]')
+            for link in all_links[:max_links * 2]:  # 多找一些链接
+                href = parser.attr(link, 'href')
+                if '/product/' in href or '/item/' in href:
+                    if not href.startswith('http'):
+                        href = 'https://example.com' + href
+                    product_links.append(href)
 
-            response = self.session.get(listing_url, timeout=10)
-            response.raise_for_status()
-            response.encoding = 'utf-8'
+        # 去重（保持顺序）
+        product_links = list(dict.fromkeys(product_links))[:max_links]
 
-            soup = BeautifulSoup(response.text, 'html.parser')
+        print(f"找到 {len(product_links)} 个商品链接")
+        return product_links
 
-            # 提取商品链接（根据实际网站结构调整选择器）
-            product_links = []
+    def iter_products(self, product_urls, max_products=None, max_workers=4):
+        """
+        并发爬取商品详情，按完成顺序逐个产出结果
 
-            # 方法1: 查找商品卡片中的链接
-            product_cards = soup.find_all('div', class_=lambda x: x and 'product' in x.lower())
-            for card in product_cards[:max_products]:
-                link = card.find('a', href=True)
-                if link:
-                    href = link['href']
-                    if not href.startswith('http'):
-                        href = 'https://example.com' + href  # 根据实际情况调整
-                    product_links.append(href)
+        同时最多 max_workers 个请求在途，每完成一个再提交下一个链接；
+        某个商品爬取失败时由后面的链接补上，凑够 max_products 个后停止。
+        每个主机的请求速度仍受限速器控制。
 
-            # 方法2: 直接查找所有商品链接
-            if not product_links:
-                all_links = soup.find_all('a', href=True)
-                for link in all_links[:max_products * 2]:  # 多找一些链接
-                    href = link['href']
-                    if '/product/' in href or '/item/' in href:
-                        if not href.startswith('http'):
-                            href = 'https://example.com' + href
-                        product_links.append(href)
-
-            # 去重
-            product_links = list(set(product_links))[:max_products]
-
-            print(f"找到 {len(product_links)} 个商品链接")
-
-            # 爬取每个商品详情
-            products_data = []
-            for link in product_links:
-                product_info = self.extract_product_info(link)
-                if product_info:
-                    products_data.append(product_info)
+        参数:
+            product_urls: 商品页面URL（可迭代对象）
+            max_products: 最大商品数量，None表示不限制
+            max_workers: 最大并发数
+        """
+        links = iter(product_urls)
+        produced = 0
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pending = {executor.submit(self.extract_product_info, link)
+                       for link in itertools.islice(links, max_workers)}
+            try:
+                while pending:
+                    done, pending = concurrent.futures.wait(
+                        pending, return_when=concurrent.futures.FIRST_COMPLETED
+                    )
+                    for future in done:
+                        product_info = future.result()
+                        if product_info:
+                            yield product_info
+                            produced += 1
+                            if max_products and produced >= max_products:
+                                return
+
+                        # 补充提交下一个链接
+                        for link in itertools.islice(links, 1):
+                            pending.add(executor.submit(self.extract_product_info, link))
+            finally:
+                # 提前结束时取消尚未开始的任务
+                for future in pending:
+                    future.cancel()
+
+    def iter_products_from_listing(self, listing_url, max_products=20, max_workers=4):
+        """
+        从商品列表页并发爬取商品详情，边爬边产出（生成器）
 
-                if len(products_data) >= max_products:
-                    break
+        参数:
+            listing_url: 商品列表页URL
+            max_products: 最大商品数量
+            max_workers: 最大并发数
+        """
+        # 多收集一些候选链接，用于补上爬取失败的商品
+        product_links = self._collect_product_links(listing_url, max_products * 2)
+        yield from self.iter_products(product_links, max_products, max_workers)
 
-            return products_data
+    def extract_products_from_listing(self, listing_url, max_products=20, max_workers=4):
+        """
+        从商品列表页提取多个商品信息
+
+        参数:
+            listing_url: 商品列表页URL
+            max_products: 最大商品数量
+            max_workers: 最大并发数，为1时逐个爬取
+        """
+        try:
+            return list(self.iter_products_from_listing(listing_url, max_products, max_workers))
 
         except Exception as e:
             print(f"爬取商品列表失败: {e}")
             return []
 
+    async def iter_products_from_listing_async(self, listing_url, max_products=20, max_concurrency=4):
+        """
+        从商品列表页并发爬取商品详情（asyncio版本，异步生成器）
+
+        参数:
+            listing_url: 商品列表页URL
+            max_products: 最大商品数量
+            max_concurrency: 最大并发数
+        """
+        product_links = await asyncio.to_thread(self._collect_product_links, listing_url, max_products * 2)
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def fetch(link):
+            async with semaphore:
+                return await asyncio.to_thread(self.extract_product_info, link)
+
+        tasks = [asyncio.create_task(fetch(link)) for link in product_links]
+        produced = 0
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                product_info = await next_done
+                if product_info:
+                    yield product_info
+                    produced += 1
+                    if produced >= max_products:
+                        return
+        finally:
+            for task in tasks:
+                task.cancel()
+
     def extract_reviews(self, product_url, max_reviews=50):
         """
         提取商品评论
@@ -139,13 +234,13 @@ class EcommerceCrawler:
 
         try:
             # 示例：从商品页面提取评论
-            response = self.session.get(product_url, timeout=10)
+            response = self.session.get(product_url)
             response.raise_for_status()
 
-            soup = BeautifulSoup(response.text, 'html.parser')
+            root = self.parser.parse(response.text)
 
             # 查找评论元素（根据实际网站结构调整）
-            review_elements = soup.find_all('div', class_=lambda x: x and 'review' in x.lower())
+            review_elements = self.parser.select(root, REVIEW_ELEMENT)
 
             for review_element in review_elements[:max_reviews]:
                 review = {
@@ -162,42 +257,44 @@ class EcommerceCrawler:
 
         return reviews
 
-    # 以下是根据具体网站结构实现的辅助方法
-    def _extract_title(self, soup):
+    # 以下是根据具体网站结构实现的辅助方法，root 是 self.parser 解析出的文档根节点
+    def _extract_title(self, root):
         # 实现提取商品标题的逻辑
-        title_element = soup.find('h1') or soup.find('title')
-        return title_element.get_text().strip() if title_element else "未知标题"
+        title_element = self.parser.select_one(root, 'h1')
+        if title_element is None:
+            title_element = self.parser.select_one(root, 'title')
+        return self.parser.text(title_element).strip() if title_element is not None else "未知标题"
 
-    def _extract_price(self, soup):
+    def _extract_price(self, root):
         # 实现提取当前价格的逻辑
         # 查找价格相关的元素
         return "未知价格"
 
-    def _extract_original_price(self, soup):
+    def _extract_original_price(self, root):
         # 实现提取原价的逻辑
         return ""
 
-    def _extract_rating(self, soup):
+    def _extract_rating(self, root):
         # 实现提取评分的逻辑
         return 0.0
 
-    def _extract_review_count(self, soup):
+    def _extract_review_count(self, root):
         # 实现提取评论数量的逻辑
         return 0
 
-    def _extract_description(self, soup):
+    def _extract_description(self, root):
         # 实现提取商品描述的逻辑
         return ""
 
-    def _extract_specifications(self, soup):
+    def _extract_specifications(self, root):
         # 实现提取商品规格的逻辑
         return {}
 
-    def _extract_images(self, soup):
+    def _extract_images(self, root):
         # 实现提取商品图片的逻辑
         return []
 
-    def _extract_stock_status(self, soup):
+    def _extract_stock_status(self, root):
         # 实现提取库存状态的逻辑
         return "未知"
 
@@ -219,7 +316,7 @@ class EcommerceCrawler:
 
 # 使用示例
 if __name__ == "__main__":
-    crawler = EcommerceCrawler(base_delay=1, max_delay=3)
+    crawler = EcommerceCrawler(requests_per_second=0.5)
 
     # 爬取商品列表
     # products = crawler.extract_products_from_listing(
@@ -227,6 +324,11 @@ if __name__ == "__main__":
     #     max_products=10
     # )
 
+    # 并发爬取，边爬边处理
+    # for product in crawler.iter_products_from_listing('https://example.com/products/category',
+    #                                                   max_products=500, max_workers=8):
+    #     print(product['title'])
+
     # 保存到Excel
     # if products:
     #     df = pd.DataFrame(products)
@@ -0,0 +1,243 @@
+"""
+网络捕获 - 通过Chrome DevTools协议（CDP）屏蔽无用资源、直接获取XHR返回的JSON
+
+    block_resources() 按资源类型（图片、字体、媒体、样式表）和URL模式屏蔽请求，页面加载更快：
+        资源类型通过 Fetch.enable 的 resourceType 过滤拦截，匹配的请求用 Fetch.failRequest 直接失败，
+        CDN上没有扩展名、带查询参数的图片和字体同样能屏蔽；
+        Fetch 拦截需要接收 requestPaused 事件，由后台线程通过 driver.bidi_connection()（需要 trio）处理；
+    capture_json() 从性能日志中找出页面发出的 XHR/fetch 请求，读取响应体并解析JSON，
+    很多动态页面的数据本来就是通过接口返回的，拿到JSON后不需要再解析DOM。
+
+捕获响应需要在启动浏览器时开启性能日志（enable_performance_log，或 BrowserPool(capture_network=True)）。
+
+依赖: pip install selenium（selenium 4 会同时安装 bidi_connection 需要的 trio、trio-websocket；
+      单独安装的 selenium 缺少 trio 时按类型拦截不可用，自动退回按扩展名屏蔽）
+"""
+import re
+import json
+import time
+import base64
+import fnmatch
+import threading
+from selenium.common.exceptions import WebDriverException
+
+# 资源类型 -> CDP的资源类型名（Fetch.enable 按类型拦截）
+RESOURCE_TYPES = {
+    'image': 'Image',
+    'font': 'Font',
+    'media': 'Media',
+    'stylesheet': 'Stylesheet',
+}
+
+# 无法使用 Fetch 拦截时（如没有安装trio）退回按扩展名匹配URL（Network.setBlockedURLs 只支持URL模式）
+RESOURCE_PATTERNS = {
+    'image': ['*.png*', '*.jpg*', '*.jpeg*', '*.gif*', '*.webp*', '*.svg*', '*.ico*', '*.bmp*', '*.avif*'],
+    'font': ['*.woff*', '*.woff2*', '*.ttf*', '*.otf*', '*.eot*'],
+    'media': ['*.mp4*', '*.webm*', '*.mp3*', '*.m4a*', '*.flv*', '*.m3u8*'],
+    'stylesheet': ['*.css*'],
+}
+
+# 常见的统计/广告脚本
+TRACKER_PATTERNS = [
+    '*google-analytics.com*', '*googletagmanager.com*', '*doubleclick.net*',
+    '*hm.baidu.com*', '*cnzz.com*', '*51.la*', '*growingio.com*',
+]
+
+DEFAULT_BLOCKED_TYPES = ('image', 'font', 'media')
+
+
+def enable_performance_log(chrome_options):
+    """
+    开启Chrome性能日志（捕获网络响应需要）
+
+    参数:
+        chrome_options: selenium的Chrome Options
+    """
+    chrome_options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
+    return chrome_options
+
+
+# (会话ID, 标签页) -> (trio令牌, 取消范围)，用于停止按类型拦截的后台线程
+_type_blockers = {}
+_type_blockers_lock = threading.Lock()
+
+
+def _run_type_blocker(driver, key, cdp_types, ready, errors):
+    """
+    后台线程：在当前标签页开启 Fetch 拦截，匹配类型的请求一律以 BlockedByClient 失败
+
+    Fetch 拦截属于这个CDP会话，连接关闭（浏览器退出或取消拦截）时自动失效。
+    """
+    try:
+        import trio
+        from trio_websocket import ConnectionClosed
+
+        async def main():
+            with trio.CancelScope() as scope:
+                with _type_blockers_lock:
+                    _type_blockers[key] = (trio.lowlevel.current_trio_token(), scope)
+                async with driver.bidi_connection() as connection:
+                    session, devtools = connection.session, connection.devtools
+                    patterns = [devtools.fetch.RequestPattern(resource_type=devtools.network.ResourceType(name))
+                                for name in cdp_types]
+                    # 缓冲区要足够大：事件缓冲满时会被丢弃，被丢弃的请求会一直暂停
+                    events = session.listen(devtools.fetch.RequestPaused, buffer_size=1024)
+                    await session.execute(devtools.fetch.enable(patterns=patterns))
+                    ready.set()
+                    async for event in events:
+                        try:
+                            await session.execute(devtools.fetch.fail_request(
+                                event.request_id, devtools.network.ErrorReason.BLOCKED_BY_CLIENT
+                            ))
+                        except ConnectionClosed:
+                            raise
+                        except Exception as e:
+                            # 单个请求出错（如导航时已被取消、请求ID失效）不影响后续拦截
+                            print(f"拦截请求失败: {event.request.url}: {e}")
+
+        trio.run(main)
+    except Exception as e:
+        # 拦截开启前出错时由调用方退回URL模式；开启后出错说明连接已断开（通常是浏览器已经退出）
+        if not ready.is_set():
+            errors.append(e)
+        else:
+            print(f"按资源类型拦截已停止: {e}")
+    finally:
+        with _type_blockers_lock:
+            _type_blockers.pop(key, None)
+        ready.set()
+
+
+def _block_types(driver, resource_types, timeout):
+    """按资源类型拦截当前标签页的请求，成功开启时返回True"""
+    cdp_types = [RESOURCE_TYPES[resource_type] for resource_type in resource_types]
+    key = (driver.session_id, driver.current_window_handle)
+    ready = threading.Event()
+    errors = []
+    thread = threading.Thread(target=_run_type_blocker, args=(driver, key, cdp_types, ready, errors), daemon=True)
+    thread.start()
+    # 等待拦截开启后再返回：期间不能切换标签页，后台线程连接的是当前标签页
+    if not ready.wait(timeout) or errors:
+        print(f"无法按资源类型拦截请求: {errors[0] if errors else '超时'}")
+        return False
+    return True
+
+
+def block_resources(driver, resource_types=DEFAULT_BLOCKED_TYPES, patterns=(), block_trackers=True, timeout=10):
+    """
+    屏蔽当前标签页的指定资源（对之后的导航生效）
+
+    参数:
+        driver: WebDriver
+        resource_types: 要屏蔽的资源类型，可选 'image'、'font'、'media'、'stylesheet'
+        patterns: 额外要屏蔽的URL模式，如 '*://*.example-ads.com/*'
+        block_trackers: 是否屏蔽常见的统计/广告脚本
+        timeout: 等待按类型拦截开启的秒数
+
+    返回:
+        通过URL模式屏蔽的模式列表
+    """
+    urls = list(patterns)
+    if block_trackers:
+        urls.extend(TRACKER_PATTERNS)
+    if resource_types and not _block_types(driver, resource_types, timeout):
+        print("改为按扩展名屏蔽资源（没有扩展名的URL无法屏蔽）")
+        urls.extend(pattern for resource_type in resource_types for pattern in RESOURCE_PATTERNS[resource_type])
+
+    if urls:
+        driver.execute_cdp_cmd('Network.enable', {})
+        driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': urls})
+    return urls
+
+
+def unblock_resources(driver):
+    """取消当前标签页的资源屏蔽"""
+    driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': []})
+    with _type_blockers_lock:
+        blocker = _type_blockers.get((driver.session_id, driver.current_window_handle))
+    if blocker:
+        import trio
+        token, scope = blocker
+        trio.from_thread.run_sync(scope.cancel, trio_token=token)
+
+
+def drain_log(driver):
+    """清空还没读取的性能日志（导航到新页面前调用，避免混入上一个页面的请求）"""
+    try:
+        driver.get_log('performance')
+    except WebDriverException:
+        pass
+
+
+def _matches(url, url_pattern):
+    if url_pattern is None:
+        return True
+    if isinstance(url_pattern, re.Pattern):
+        return bool(url_pattern.search(url))
+    return fnmatch.fnmatch(url, url_pattern) or url_pattern in url
+
+
+def capture_json(driver, url_pattern=None, resource_types=('XHR', 'Fetch'), idle_time=0.5, timeout=10):
+    """
+    获取页面通过 XHR/fetch 请求得到的JSON数据
+
+    持续读取性能日志，直到网络空闲 idle_time 秒（且匹配的请求都已加载完成）或超过 timeout 秒。
+
+    参数:
+        driver: WebDriver（已打开目标页面，启动时开启了性能日志）
+        url_pattern: 只要URL匹配的请求：通配符（如 '*/api/*'）、子串或编译好的正则，为None时不过滤
+        resource_types: 请求类型，CDP的资源类型名
+        idle_time: 网络空闲多久认为请求已经结束（秒）
+        timeout: 最长等待时间（秒）
+
+    返回:
+        [{'url': 请求URL, 'status': 状态码, 'data': 解析后的JSON}, ...]，按响应到达顺序排列
+    """
+    responses = {}   # requestId -> 响应信息
+    finished = set()
+    captured = []
+    start = last_activity = time.monotonic()
+
+    while True:
+        entries = driver.get_log('performance')
+        now = time.monotonic()
+        if entries:
+            last_activity = now
+
+        for entry in entries:
+            message = json.loads(entry['message'])['message']
+            method = message.get('method')
+            params = message.get('params', {})
+
+            if method == 'Network.responseReceived':
+                response = params['response']
+                if (params.get('type') in resource_types and 'json' in response.get('mimeType', '')
+                        and _matches(response['url'], url_pattern)):
+                    responses[params['requestId']] = {'url': response['url'], 'status': response['status']}
+
+            elif method in ('Network.loadingFinished', 'Network.loadingFailed'):
+                request_id = params['requestId']
+                if request_id not in responses or request_id in finished:
+                    continue
+                finished.add(request_id)
+                if method == 'Network.loadingFailed':
+                    continue
+                try:
+                    body = driver.execute_cdp_cmd('Network.getResponseBody', {'requestId': request_id})
+                    text = body['body']
+                    if body.get('base64Encoded'):
+                        text = base64.b64decode(text).decode('utf-8')
+                    captured.append(dict(responses[request_id], data=json.loads(text)))
+                except (WebDriverException, ValueError) as e:
+                    print(f"读取响应失败: {responses[request_id]['url']}: {e}")
+
+        pending = len(responses) - len(finished)
+        if now - start > timeout:
+            if pending:
+                print(f"等待超时，还有 {pending} 个请求没有完成")
+            break
+        if now - last_activity >= idle_time and not pending:
+            break
+        time.sleep(0.1)
+
+    return captured
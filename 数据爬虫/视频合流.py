@@ -0,0 +1,110 @@
+"""
+视频合流 - 把分开下载的视频轨和音频轨（如B站DASH的两个 .m4s）合并成一个MP4
+
+使用 ffmpeg 的流复制（-c copy）：只重新封装容器，不解码、不重新编码，
+几秒钟完成，画质和音质与原文件完全一致。
+ffmpeg 优先使用系统 PATH 中的，没有时使用 moviepy 自带的 imageio-ffmpeg。
+需要真正剪辑（裁剪、拼接、加字幕等）时才使用 moviepy。
+"""
+import os
+import shutil
+import subprocess
+import concurrent.futures
+
+
+def find_ffmpeg():
+    """查找ffmpeg可执行文件"""
+    path = shutil.which('ffmpeg')
+    if path:
+        return path
+    try:
+        import imageio_ffmpeg  # moviepy 的依赖，自带ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except Exception:
+        raise FileNotFoundError("找不到ffmpeg，请安装ffmpeg或 pip install imageio-ffmpeg")
+
+
+def mux_command(video_input, audio_input, output_file, ffmpeg=None):
+    """
+    生成合流命令
+
+    参数:
+        video_input: 视频轨（文件路径，或 'pipe:N' 等ffmpeg输入）
+        audio_input: 音频轨
+        output_file: 输出文件
+        ffmpeg: ffmpeg路径，默认自动查找
+    """
+    return [
+        ffmpeg or find_ffmpeg(), '-y', '-hide_banner', '-loglevel', 'error',
+        '-i', video_input, '-i', audio_input,
+        '-map', '0:v:0', '-map', '1:a:0',
+        '-c', 'copy',
+        '-movflags', '+faststart',  # 索引放在文件开头，边下边播
+        output_file,
+    ]
+
+
+def mux(video_file, audio_file, output_file):
+    """
+    合并视频轨和音频轨（流复制，不重新编码）
+
+    参数:
+        video_file: 视频文件
+        audio_file: 音频文件
+        output_file: 输出文件（.mp4）
+
+    返回:
+        输出文件路径
+    """
+    for path in (video_file, audio_file):
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"文件不存在: {path}")
+
+    # 先输出到临时文件，失败时不会留下不完整的输出文件
+    stem, ext = os.path.splitext(output_file)
+    tmp_file = f'{stem}.tmp{ext or ".mp4"}'
+    result = subprocess.run(mux_command(video_file, audio_file, tmp_file), capture_output=True, text=True)
+    if result.returncode != 0:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+        raise RuntimeError(f"ffmpeg合流失败: {result.stderr.strip()}")
+
+    os.replace(tmp_file, output_file)
+    print(f"合流完成: {output_file}")
+    return output_file
+
+
+def mux_many(jobs, max_workers=None):
+    """
+    批量合流
+
+    每个任务由一个ffmpeg子进程完成，这里只负责启动和等待子进程，用线程池调度即可并行。
+
+    参数:
+        jobs: (视频文件, 音频文件, 输出文件) 的列表
+        max_workers: 同时运行的ffmpeg进程数，默认为CPU核数
+
+    返回:
+        [(输出文件, 错误信息或None), ...]，顺序与 jobs 相同
+    """
+    jobs = list(jobs)
+    max_workers = max_workers or os.cpu_count() or 4
+
+    def run(job):
+        try:
+            mux(*job)
+            return job[2], None
+        except Exception as e:
+            print(f"合流失败: {job[2]}: {e}")
+            return job[2], str(e)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(run, jobs))
+
+
+# 使用示例
+if __name__ == "__main__":
+    mux('B站视频.mp4', 'B站音频.mp3', '新宝岛.mp4')
+
+    # 批量合流
+    # results = mux_many([('1_video.m4s', '1_audio.m4s', '1.mp4'), ('2_video.m4s', '2_audio.m4s', '2.mp4')])
@@ -1,135 +1,350 @@
-import requests
-import os
-import re
-import subprocess
-from urllib.parse import urljoin, urlparse
+import asyncio
 import concurrent.futures
 import m3u8
+import time
+from Crypto.Cipher import AES
+from Crypto.Util.Padding import unpad
+from HTTP客户端 import get_session
+from 分段下载器 import ranged_download
 
 
-def download_video_m3u8(m3u8_url, output_file='video.mp4', temp_dir='temp_ts'):
+def _decrypt_segment(data, key, iv):
     """
-    m3u8视频流下载器 - 下载并合并ts片段
+    AES-128-CBC解密一个ts片段（模块级函数，可在进程池中执行）
+
+    参数:
+        data: 加密的片段数据
+        key: 16字节密钥
+        iv: 16字节初始向量
+    """
+    decrypted = AES.new(key, AES.MODE_CBC, iv).decrypt(data)
+    try:
+        return unpad(decrypted, AES.block_size)
+    except ValueError:
+        # 个别源不做PKCS7填充，直接返回解密结果
+        return decrypted
+
+
+def _fetch_keys(segments, headers):
+    """
+    下载片段用到的所有AES-128密钥，每个密钥URL只请求一次
+
+    参数:
+        segments: 片段信息列表（含 key_url）
+        headers: 请求头
+    """
+    key_cache = {}
+    for segment in segments:
+        key_url = segment['key_url']
+        if key_url and key_url not in key_cache:
+            response = get_session().get(key_url, headers=headers)
+            response.raise_for_status()
+            key_cache[key_url] = response.content
+            print(f"已获取解密密钥: {key_url}")
+    return key_cache
+
+
+def _measure_throughput(playlist_url, headers):
+    """
+    下载一个片段测量当前带宽（bit/s）
+
+    参数:
+        playlist_url: 媒体播放列表URL（通常取码率最低的变体）
+        headers: 请求头
+    """
+    response = get_session().get(playlist_url, headers=headers)
+    response.raise_for_status()
+    playlist = m3u8.loads(response.text, uri=playlist_url)
+    if not playlist.segments:
+        return None
+
+    start = time.time()
+    response = get_session().get(playlist.segments[0].absolute_uri, headers=headers, timeout=30)
+    response.raise_for_status()
+    elapsed = max(time.time() - start, 1e-3)
+    return len(response.content) * 8 / elapsed
+
+
+def select_variant(playlists, prefer='auto', max_bandwidth=None, max_height=None, throughput=None):
+    """
+    从主播放列表（master playlist）的多个码率变体中选择一个
+
+    参数:
+        playlists: m3u8主播放列表的 playlists
+        prefer: 选择方式 - 'bandwidth' 选码率最高的, 'resolution' 选分辨率最高的,
+                'auto' 选实测带宽能流畅下载的最高码率
+        max_bandwidth: 允许的最高码率（bit/s）
+        max_height: 允许的最高分辨率高度，如 720
+        throughput: prefer='auto' 时使用的实测带宽（bit/s）
+    """
+    def bandwidth(p):
+        return p.stream_info.bandwidth or 0
+
+    def height(p):
+        resolution = p.stream_info.resolution
+        return resolution[1] if resolution else 0
+
+    candidates = list(playlists)
+    if max_bandwidth:
+        candidates = [p for p in candidates if bandwidth(p) <= max_bandwidth] or candidates
+    if max_height:
+        candidates = [p for p in candidates if height(p) <= max_height] or candidates
+
+    if prefer == 'resolution':
+        return max(candidates, key=lambda p: (height(p), bandwidth(p)))
+
+    if prefer == 'auto' and throughput:
+        # 留出20%余量，避免下载速度跟不上
+        affordable = [p for p in candidates if bandwidth(p) <= throughput * 0.8]
+        if affordable:
+            return max(affordable, key=bandwidth)
+        return min(candidates, key=bandwidth)
+
+    return max(candidates, key=bandwidth)
+
+
+def _resolve_media_playlist(m3u8_url, headers, prefer='auto', max_bandwidth=None, max_height=None):
+    """
+    解析m3u8，如果是主播放列表则选择一个变体并返回其媒体播放列表
 
     参数:
         m3u8_url: m3u8文件的URL
+        headers: 请求头
+        prefer, max_bandwidth, max_height: 见 select_variant
+    """
+    response = get_session().get(m3u8_url, headers=headers)
+    response.raise_for_status()
+    playlist = m3u8.loads(response.text, uri=m3u8_url)
+
+    while playlist.is_variant:
+        variants = playlist.playlists
+        print(f"检测到主播放列表，共 {len(variants)} 个码率变体")
+
+        throughput = None
+        if prefer == 'auto':
+            lowest = min(variants, key=lambda p: p.stream_info.bandwidth or 0)
+            throughput = _measure_throughput(lowest.absolute_uri, headers)
+            if throughput:
+                print(f"实测带宽: {throughput / 1e6:.2f} Mbps")
+
+        variant = select_variant(variants, prefer, max_bandwidth, max_height, throughput)
+        print(f"选择变体: 码率 {variant.stream_info.bandwidth}, 分辨率 {variant.stream_info.resolution}")
+
+        m3u8_url = variant.absolute_uri
+        response = get_session().get(m3u8_url, headers=headers)
+        response.raise_for_status()
+        playlist = m3u8.loads(response.text, uri=m3u8_url)
+
+    return playlist
+
+
+def _collect_segments(playlist):
+    """
+    整理媒体播放列表中的片段URL及其加密信息
+
+    参数:
+        playlist: m3u8媒体播放列表
+    """
+    segments = []
+    media_sequence = playlist.media_sequence or 0
+    for index, segment in enumerate(playlist.segments):
+        key = segment.key
+        key_url, iv = None, None
+        if key and key.method and key.method != 'NONE':
+            if key.method != 'AES-128':
+                raise ValueError(f"不支持的加密方式: {key.method}")
+            key_url = key.absolute_uri
+            if key.iv:
+                iv = bytes.fromhex(key.iv[2:] if key.iv.lower().startswith('0x') else key.iv)
+            else:
+                # 没有指定IV时，使用片段序号作为IV（HLS规范）
+                iv = (media_sequence + index).to_bytes(16, 'big')
+        segments.append({'url': segment.absolute_uri, 'key_url': key_url, 'iv': iv})
+    return segments
+
+
+async def _fetch_segment(ts_url, headers, retries=3):
+    """
+    下载单个ts片段（在线程中执行阻塞请求，不阻塞事件循环）
+
+    参数:
+        ts_url: ts片段URL
+        headers: 请求头
+        retries: 失败重试次数
+    """
+    for attempt in range(retries):
+        try:
+            ts_response = await asyncio.to_thread(get_session().get, ts_url, headers=headers, timeout=30)
+            ts_response.raise_for_status()
+            return ts_response.content
+        except Exception as e:
+            if attempt == retries - 1:
+                raise
+            print(f"片段下载失败，正在重试({attempt + 1}/{retries}): {e}")
+            await asyncio.sleep(1)
+
+
+async def _download_segments_ordered(segments, output_file, headers, max_concurrency=8, max_buffer_mb=64,
+                                     key_cache=None, decrypt_executor=None):
+    """
+    异步并发下载ts片段，并按顺序直接追加写入输出文件（不产生临时文件）
+
+    片段下载完成后先放入重排缓冲区，一旦它之前的所有片段都已到达就立即写入文件。
+    缓冲区占用超过 max_buffer_mb 时，后续片段会等待前面的片段写出后再进入缓冲区。
+
+    参数:
+        segments: 按播放顺序排列的片段信息列表（url, key_url, iv）
         output_file: 输出视频文件名
-        temp_dir: 临时ts文件存储目录
+        headers: 请求头
+        max_concurrency: 同时下载的片段数
+        max_buffer_mb: 重排缓冲区的内存上限（MB）
+        key_cache: 密钥URL -> 密钥 的缓存
+        decrypt_executor: 执行AES解密的线程池/进程池，为None时使用默认线程池
+    """
+    max_buffer_bytes = max_buffer_mb * 1024 * 1024
+    semaphore = asyncio.Semaphore(max_concurrency)
+    condition = asyncio.Condition()
+
+    buffer = {}  # 片段序号 -> 片段数据（None表示下载失败，直接跳过）
+    state = {'next_index': 0, 'buffered_bytes': 0, 'written': 0, 'failed': 0}
+    total = len(segments)
+    key_cache = key_cache or {}
+    loop = asyncio.get_running_loop()
+
+    with open(output_file, 'wb') as merged:
+
+        def flush_ready():
+            # 把从 next_index 开始连续到达的片段依次写入文件
+            while state['next_index'] in buffer:
+                data = buffer.pop(state['next_index'])
+                if data is not None:
+                    merged.write(data)
+                    state['buffered_bytes'] -= len(data)
+                    state['written'] += 1
+                state['next_index'] += 1
+
+        async def worker(index, segment):
+            try:
+                try:
+                    data = await _fetch_segment(segment['url'], headers)
+                    if segment['key_url']:
+                        # 解密在池中执行，不阻塞下载
+                        data = await loop.run_in_executor(
+                            decrypt_executor, _decrypt_segment,
+                            data, key_cache[segment['key_url']], segment['iv']
+                        )
+                except Exception as e:
+                    print(f"下载片段 {index} 失败: {e}")
+                    state['failed'] += 1
+                    data = None
+
+                async with condition:
+                    # 缓冲区已满时，只有轮到写出的片段可以进入，其余片段等待
+                    size = len(data) if data else 0
+                    await condition.wait_for(
+                        lambda: index == state['next_index']
+                        or state['buffered_bytes'] + size <= max_buffer_bytes
+                    )
+                    buffer[index] = data
+                    state['buffered_bytes'] += size
+                    flush_ready()
+                    condition.notify_all()
+
+                print(f"下载完成: {index + 1}/{total}，已写入 {state['written']} 个片段")
+            finally:
+                semaphore.release()
+
+        # 按顺序启动下载任务，保证排在最前面的片段总是最先开始，不会因缓冲区满而死锁
+        tasks = []
+        for index, segment in enumerate(segments):
+            await semaphore.acquire()
+            tasks.append(asyncio.create_task(worker(index, segment)))
+
+        await asyncio.gather(*tasks)
+
+    return state['written'], state['failed']
+
+
+def download_video_m3u8(m3u8_url, output_file='video.mp4', max_concurrency=8, max_buffer_mb=64,
+                        prefer='auto', max_bandwidth=None, max_height=None,
+                        decrypt_workers=None, decrypt_in_processes=False):
     """
+    m3u8视频流下载器 - 异步并发下载ts片段并按顺序流式写入输出文件
 
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
-        'Referer': 'https://www.example.com/'  # 根据实际情况设置Referer
-    }
+    支持主播放列表（按码率/分辨率/实测带宽选择变体）和AES-128加密片段。
 
-    # 创建临时目录
-    if not os.path.exists(temp_dir):
-        os.makedirs(temp_dir)
+    参数:
+        m3u8_url: m3u8文件的URL
+        output_file: 输出视频文件名
+        max_concurrency: 同时下载的片段数（控制并发数避免被封IP）
+        max_buffer_mb: 乱序到达片段的缓冲区内存上限（MB）
+        prefer: 主播放列表的变体选择方式 'auto' / 'bandwidth' / 'resolution'
+        max_bandwidth: 允许的最高码率（bit/s）
+        max_height: 允许的最高分辨率高度
+        decrypt_workers: 解密池的工作线程/进程数
+        decrypt_in_processes: 是否使用进程池解密（高码率流CPU吃紧时使用）
+    """
+
+    # 通用请求头由共享会话提供，这里只补充Referer（根据实际情况设置）
+    headers = {'Referer': 'https://www.example.com/'}
 
     try:
         print(f"正在解析m3u8文件: {m3u8_url}")
 
-        # 解析m3u8文件
-        response = requests.get(m3u8_url, headers=headers, timeout=10)
-        response.raise_for_status()
-
-        # 解析m3u8内容
-        m3u8_content = response.text
-        playlist = m3u8.loads(m3u8_content)
+        # 解析m3u8（主播放列表会先选择变体）
+        playlist = _resolve_media_playlist(m3u8_url, headers, prefer, max_bandwidth, max_height)
+        segments = _collect_segments(playlist)
 
-        # 获取基础URL（用于构建完整的ts文件URL）
-        base_url = m3u8_url.rsplit('/', 1)[0] + '/'
+        print(f"找到 {len(segments)} 个ts片段")
 
-        ts_urls = []
-        for segment in playlist.segments:
-            ts_url = segment.uri
-            # 如果ts_url不是完整URL，则拼接基础URL
-            if not ts_url.startswith('http'):
-                ts_url = urljoin(base_url, ts_url)
-            ts_urls.append(ts_url)
+        # 密钥只下载一次，所有片段共用
+        key_cache = _fetch_keys(segments, headers)
+        if key_cache:
+            print(f"片段已加密（AES-128），共 {len(key_cache)} 个密钥")
 
-        print(f"找到 {len(ts_urls)} 个ts片段")
+        pool_class = (concurrent.futures.ProcessPoolExecutor if decrypt_in_processes
+                      else concurrent.futures.ThreadPoolExecutor)
 
-        # 下载所有ts片段
-        def download_ts(ts_url, index):
-            try:
-                ts_response = requests.get(ts_url, headers=headers, timeout=30)
-                ts_response.raise_for_status()
-
-                ts_filename = os.path.join(temp_dir, f'segment_{index:05d}.ts')
-                with open(ts_filename, 'wb') as f:
-                    f.write(ts_response.content)
-
-                print(f"下载完成: {index + 1}/{len(ts_urls)}")
-                return ts_filename
-            except Exception as e:
-                print(f"下载片段 {index} 失败: {e}")
-                return None
-
-        # 使用线程池并发下载（控制并发数避免被封IP）
-        ts_files = []
-        with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
-            futures = {executor.submit(download_ts, ts_url, i): i for i, ts_url in enumerate(ts_urls)}
-
-            for future in concurrent.futures.as_completed(futures):
-                result = future.result()
-                if result:
-                    ts_files.append(result)
-
-        # 按顺序合并ts文件
-        print("正在合并ts文件...")
-        with open(output_file, 'wb') as merged:
-            for ts_file in sorted(ts_files):
-                with open(ts_file, 'rb') as f:
-                    merged.write(f.read())
-
-        # 清理临时文件
-        for ts_file in ts_files:
-            os.remove(ts_file)
-        os.rmdir(temp_dir)
+        # 边下载边解密，按顺序写入输出文件
+        with pool_class(max_workers=decrypt_workers) as decrypt_executor:
+            written, failed = asyncio.run(
+                _download_segments_ordered(segments, output_file, headers, max_concurrency, max_buffer_mb,
+                                           key_cache, decrypt_executor)
+            )
 
-        print(f"视频下载完成: {output_file}")
+        if failed:
+            print(f"有 {failed} 个片段下载失败，已跳过")
+        print(f"视频下载完成: {output_file}（共写入 {written} 个片段）")
 
     except Exception as e:
         print(f"视频下载失败: {e}")
 
 
-def download_direct_video(video_url, output_file='video.mp4'):
+def download_direct_video(video_url, output_file='video.mp4', connections=4, store=None):
     """
     直接下载视频文件（适用于mp4等直接链接）
 
+    服务器支持Range请求时多连接分段下载，中断后重新运行可断点续传。
+
     参数:
         video_url: 视频直链URL
         output_file: 输出文件名
+        connections: 并行连接数
+        store: MediaStore媒体仓库，传入时已下载过的内容不会重复下载
     """
 
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
-        'Referer': 'https://www.example.com/'
-    }
+    # 通用请求头由共享会话提供，这里只补充Referer
+    headers = {'Referer': 'https://www.example.com/'}
 
     try:
         print(f"正在下载视频: {video_url}")
 
-        # 流式下载大文件
-        response = requests.get(video_url, headers=headers, stream=True, timeout=30)
-        response.raise_for_status()
-
-        total_size = int(response.headers.get('content-length', 0))
-        downloaded_size = 0
+        if store:
+            output_file = store.fetch(video_url, output_file, headers=headers, connections=connections)
+        else:
+            ranged_download(video_url, output_file, headers=headers, connections=connections)
 
-        with open(output_file, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                if chunk:
-                    f.write(chunk)
-                    downloaded_size += len(chunk)
-
-                    # 显示下载进度
-                    if total_size > 0:
-                        progress = (downloaded_size / total_size) * 100
-                        print(f"\r下载进度: {progress:.1f}%", end='', flush=True)
-
-        print(f"\n视频下载完成: {output_file}")
+        print(f"视频下载完成: {output_file}")
 
     except Exception as e:
         print(f"视频下载失败: {e}")
@@ -140,6 +355,10 @@ if __name__ == "__main__":
     # 示例：下载直接链接视频
     # download_direct_video('https://example.com/video.mp4', 'my_video.mp4')
 
+    # 示例：重复运行时跳过已下载的视频
+    # from 媒体仓库 import MediaStore
+    # download_direct_video('https://example.com/video.mp4', 'my_video.mp4', store=MediaStore('media_store'))
+
     # 示例：下载m3u8视频
     # download_video_m3u8('https://example.com/playlist.m3u8', 'my_video.mp4')
     pass
\ No newline at end of file
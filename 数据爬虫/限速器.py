@@ -0,0 +1,129 @@
+import time
+import asyncio
+import threading
+from urllib.parse import urlparse
+
+
+class TokenBucket:
+    """
+    令牌桶 - 平均每秒发放 rate 个令牌，最多积攒 burst 个
+
+    每次请求消耗一个令牌；令牌不足时计算需要等待的时间，
+    线程中用 acquire() 阻塞等待，asyncio 中用 await acquire_async()。
+    """
+
+    def __init__(self, rate, burst=1):
+        """
+        初始化
+
+        参数:
+            rate: 每秒请求数，None或0表示不限速
+            burst: 允许的突发请求数
+        """
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self):
+        """预订一个令牌，返回需要等待的秒数（令牌可以透支，保证先到先得）"""
+        if not self.rate:
+            return 0
+
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0
+            return -self.tokens / self.rate
+
+    def acquire(self):
+        """获取一个令牌（阻塞当前线程直到可以发送请求）"""
+        delay = self._reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+    async def acquire_async(self):
+        """获取一个令牌（asyncio版本，不阻塞事件循环）"""
+        delay = self._reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class HostRateLimiter:
+    """
+    按主机限速器 - 每个主机一个独立的令牌桶
+
+    不同主机之间互不影响，可以各自以允许的速度并行抓取；
+    同一主机的所有线程/协程共享一个令牌桶。
+    """
+
+    def __init__(self, rate=1.0, burst=1, host_rates=None):
+        """
+        初始化
+
+        参数:
+            rate: 默认每秒请求数
+            burst: 默认突发请求数
+            host_rates: 特定主机的限速设置，如 {'api.example.com': (5, 10)}
+        """
+        self.rate = rate
+        self.burst = burst
+        self.host_rates = dict(host_rates or {})
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def set_rate(self, host, rate, burst=1):
+        """
+        设置某个主机的限速
+
+        参数:
+            host: 主机名
+            rate: 每秒请求数
+            burst: 突发请求数
+        """
+        with self._lock:
+            self.host_rates[host] = (rate, burst)
+            self._buckets[host] = TokenBucket(rate, burst)
+
+    def bucket(self, url):
+        """获取URL所属主机的令牌桶"""
+        host = urlparse(url).netloc or url
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                rate, burst = self.host_rates.get(host, (self.rate, self.burst))
+                bucket = self._buckets[host] = TokenBucket(rate, burst)
+            return bucket
+
+    def wait(self, url):
+        """
+        请求URL前调用，必要时阻塞等待
+
+        参数:
+            url: 即将请求的URL
+        """
+        self.bucket(url).acquire()
+
+    async def wait_async(self, url):
+        """
+        请求URL前调用（asyncio版本）
+
+        参数:
+            url: 即将请求的URL
+        """
+        await self.bucket(url).acquire_async()
+
+
+# 使用示例
+if __name__ == "__main__":
+    limiter = HostRateLimiter(rate=2, burst=1, host_rates={'b.example.com': (5, 5)})
+
+    start = time.monotonic()
+    for i in range(4):
+        limiter.wait('https://a.example.com/page')
+        limiter.wait('https://b.example.com/page')
+        print(f"第 {i + 1} 轮，耗时 {time.monotonic() - start:.2f} 秒")
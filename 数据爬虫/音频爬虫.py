@@ -1,55 +1,57 @@
-import requests
 import os
 import json
-from bs4 import BeautifulSoup
 import re
+from urllib.parse import urljoin
+from HTTP客户端 import get_session
+from HTML解析器 import get_parser
+from 分段下载器 import ranged_download
+from 媒体仓库 import MediaStore
 
+# 脚本中的音频URL
+SCRIPT_AUDIO_URL = re.compile(r'https?://[^\s"\']*\.(?:mp3|wav|m4a)[^\s"\']*')
 
-def extract_audio_urls(webpage_url, audio_extensions=None):
+
+def extract_audio_urls(webpage_url, audio_extensions=None, parser=None):
     """
     从网页中提取音频链接
 
     参数:
         webpage_url: 网页URL
         audio_extensions: 音频文件扩展名列表
+        parser: HTML解析后端 'lxml' / 'bs4-lxml' / 'html.parser'，默认使用可用的最快后端
     """
 
     if audio_extensions is None:
         audio_extensions = ['mp3', 'wav', 'm4a', 'aac', 'ogg', 'flac']
 
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-    }
-
     try:
-        response = requests.get(webpage_url, headers=headers, timeout=10)
+        response = get_session().get(webpage_url)
         response.raise_for_status()
 
-        soup = BeautifulSoup(response.text, 'html.parser')
+        parser = get_parser(parser)
+        root = parser.parse(response.text)
 
         audio_urls = []
 
         # 方法1: 查找audio标签
-        audio_tags = soup.find_all('audio')
-        for audio in audio_tags:
-            src = audio.get('src')
+        for audio in parser.select(root, 'audio[src]'):
+            src = parser.attr(audio, 'src')
             if src:
                 audio_urls.append(src)
 
         # 方法2: 查找所有可能的音频文件链接
-        all_links = soup.find_all('a', href=True)
-        for link in all_links:
-            href = link['href']
-            if any(href.lower().endswith(ext) for ext in audio_extensions):
+        extensions = tuple(ext.lower() for ext in audio_extensions)
+        for link in parser.select(root, 'a[href]'):
+            href = parser.attr(link, 'href')
+            if href.lower().endswith(extensions):
                 audio_urls.append(href)
 
         # 方法3: 在脚本中查找音频URL（常见于动态加载的音频）
-        script_tags = soup.find_all('script')
-        for script in script_tags:
-            if script.string:
-                # 使用正则表达式查找音频URL
-                urls = re.findall(r'https?://[^\s"\']*\.(?:mp3|wav|m4a)[^\s"\']*', script.string)
-                audio_urls.extend(urls)
+        for script in parser.select(root, 'script'):
+            script_text = parser.text(script)
+            if script_text:
+                # 使用预编译的正则表达式查找音频URL
+                audio_urls.extend(SCRIPT_AUDIO_URL.findall(script_text))
 
         # 转换为完整URL
         base_url = webpage_url.rsplit('/', 1)[0] + '/'
@@ -66,22 +68,24 @@ def extract_audio_urls(webpage_url, audio_extensions=None):
         return []
 
 
-def download_audio(audio_url, output_dir='audio_downloads'):
+def download_audio(audio_url, output_dir='audio_downloads', connections=4, store=None):
     """
     下载单个音频文件
 
+    服务器支持Range请求时多连接分段下载，中断后重新运行可断点续传。
+
     参数:
         audio_url: 音频文件URL
         output_dir: 输出目录
+        connections: 并行连接数
+        store: MediaStore媒体仓库，传入时已下载过的内容不会重复下载
     """
 
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
 
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
-        'Referer': 'https://www.example.com/'
-    }
+    # 通用请求头由共享会话提供，这里只补充Referer
+    headers = {'Referer': 'https://www.example.com/'}
 
     try:
         # 获取文件名
@@ -90,23 +94,12 @@ def download_audio(audio_url, output_dir='audio_downloads'):
 
         print(f"正在下载音频: {filename}")
 
-        response = requests.get(audio_url, headers=headers, stream=True, timeout=30)
-        response.raise_for_status()
-
-        total_size = int(response.headers.get('content-length', 0))
-        downloaded_size = 0
+        if store:
+            filepath = store.fetch(audio_url, filepath, headers=headers, connections=connections)
+        else:
+            ranged_download(audio_url, filepath, headers=headers, connections=connections)
 
-        with open(filepath, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                if chunk:
-                    f.write(chunk)
-                    downloaded_size += len(chunk)
-
-                    if total_size > 0:
-                        progress = (downloaded_size / total_size) * 100
-                        print(f"\r下载进度: {progress:.1f}%", end='', flush=True)
-
-        print(f"\n音频下载完成: {filepath}")
+        print(f"音频下载完成: {filepath}")
         return filepath
 
     except Exception as e:
@@ -114,13 +107,14 @@ def download_audio(audio_url, output_dir='audio_downloads'):
         return None
 
 
-def batch_download_audio(webpage_url, output_dir='audio_downloads'):
+def batch_download_audio(webpage_url, output_dir='audio_downloads', store_root=None):
     """
     批量下载网页中的所有音频文件
 
     参数:
         webpage_url: 网页URL
         output_dir: 输出目录
+        store_root: 媒体仓库目录（如 'media_store'），传入时重复运行会跳过已下载的音频；默认不使用仓库
     """
 
     print(f"开始从网页提取音频链接: {webpage_url}")
@@ -132,13 +126,18 @@ def batch_download_audio(webpage_url, output_dir='audio_downloads'):
 
     print(f"找到 {len(audio_urls)} 个音频文件")
 
+    store = MediaStore(store_root) if store_root else None
+
     success_count = 0
     for i, audio_url in enumerate(audio_urls):
         print(f"\n正在下载第 {i + 1}/{len(audio_urls)} 个音频")
-        result = download_audio(audio_url, output_dir)
+        result = download_audio(audio_url, output_dir, store=store)
         if result:
             success_count += 1
 
+    if store:
+        store.close()
+
     print(f"\n音频下载完成！成功下载 {success_count}/{len(audio_urls)} 个文件")
 
 
@@ -146,4 +145,7 @@ def batch_download_audio(webpage_url, output_dir='audio_downloads'):
 if __name__ == "__main__":
     # 示例：批量下载网页中的音频
     # batch_download_audio('https://example.com/audio-page', 'my_audio_files')
+
+    # 使用媒体仓库，重复运行时内容未变化的音频不会重新下载
+    # batch_download_audio('https://example.com/audio-page', 'my_audio_files', store_root='media_store')
     pass
\ No newline at end of file